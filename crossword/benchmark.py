@@ -0,0 +1,163 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from crossword import Crossword, WordIndex
+from generate import BitsetCrosswordCreator, CrosswordCreator
+
+# Relative frequency of each letter in English text
+LETTER_FREQUENCIES = {
+    "E": 12.7, "T": 9.1, "A": 8.2, "O": 7.5, "I": 7.0, "N": 6.7, "S": 6.3,
+    "H": 6.1, "R": 6.0, "D": 4.3, "L": 4.0, "C": 2.8, "U": 2.8, "M": 2.4,
+    "W": 2.4, "F": 2.2, "G": 2.0, "Y": 2.0, "P": 1.9, "B": 1.5, "V": 1.0,
+    "K": 0.8, "J": 0.2, "X": 0.2, "Q": 0.1, "Z": 0.1,
+}
+
+
+def synthetic_words(words_file, count, seed=0):
+    """
+    Return the words of `words_file` together with random words up to
+    `count` in all, with lengths drawn from those of the file's words
+    and letters drawn by their frequency in English.
+    """
+    rng = random.Random(seed)
+    with open(words_file) as f:
+        words = set(f.read().upper().splitlines())
+    lengths = [len(word) for word in words]
+    letters = list(LETTER_FREQUENCIES)
+    weights = list(LETTER_FREQUENCIES.values())
+    while len(words) < count:
+        words.add("".join(rng.choices(letters, weights,
+                                      k=rng.choice(lengths))))
+    return words
+
+
+def dictionaries(args):
+    """
+    Yield (description, words file) for the given words file and, for
+    each of `args.sizes`, a temporary file of that many synthetic words.
+    """
+    yield args.words, args.words
+    for size in args.sizes:
+        with tempfile.NamedTemporaryFile("w", suffix=".txt") as f:
+            f.write("\n".join(sorted(synthetic_words(args.words, size))))
+            f.flush()
+            yield f"{size} synthetic words", f.name
+
+
+def bench_domains(args):
+    """
+    Time node and arc consistency with set domains against bitset
+    domains, checking that they leave the same words in each domain,
+    and time solving with each.
+    """
+    for description, words_file in dictionaries(args):
+        crossword = Crossword(args.structure, words_file)
+        print(f"{os.path.basename(args.structure)}, {description}")
+
+        start = time.perf_counter()
+        index = WordIndex(crossword.words)
+        print(f"  index       {time.perf_counter() - start:8.4f}s")
+
+        domains = {}
+        creators = {
+            "sets": lambda: CrosswordCreator(crossword),
+            "bitsets": lambda: BitsetCrosswordCreator(crossword, index),
+        }
+        for name, make in creators.items():
+            if name == "sets" and len(crossword.words) > args.max_sets_words:
+                continue
+            creator = make()
+            start = time.perf_counter()
+            creator.enforce_node_consistency()
+            node = time.perf_counter() - start
+            start = time.perf_counter()
+            creator.ac3()
+            arc = time.perf_counter() - start
+            domains[name] = {
+                var: (set(index.members(domain)) if name == "bitsets"
+                      else domain)
+                for var, domain in creator.domains.items()
+            }
+
+            start = time.perf_counter()
+            assignment = make().solve()
+            solve = time.perf_counter() - start
+            print(f"  {name:8} node {node:8.4f}s  ac3 {arc:8.4f}s  "
+                  f"solve {solve:8.4f}s  "
+                  f"{'solved' if assignment else 'no solution'}")
+
+        if len(domains) == 2:
+            assert domains["sets"] == domains["bitsets"], "domains differ"
+
+
+def bench_search(args):
+    """
+    Time plain backtracking against maintaining arc consistency, with
+    set and bitset domains, counting the assignments each tries and
+    checking each solution. Both kinds of domain order variables and
+    words alike, so each search must try as many assignments with
+    either.
+    """
+    for description, words_file in dictionaries(args):
+        crossword = Crossword(args.structure, words_file)
+        index = WordIndex(crossword.words)
+        print(f"{os.path.basename(args.structure)}, {description}")
+        creators = {
+            "sets": lambda: CrosswordCreator(crossword),
+            "bitsets": lambda: BitsetCrosswordCreator(crossword, index),
+        }
+        nodes = {}
+        for name, make in creators.items():
+            if name == "sets" and len(crossword.words) > args.max_sets_words:
+                continue
+            for search in ("backtrack", "mac"):
+                creator = make()
+                start = time.perf_counter()
+                assignment = creator.solve(search)
+                elapsed = time.perf_counter() - start
+                if assignment is not None:
+                    assert creator.assignment_complete(assignment)
+                    assert creator.consistent(assignment)
+                print(f"  {name:8} {search:10}{elapsed:9.4f}s  "
+                      f"{creator.nodes:8} nodes  "
+                      f"{'solved' if assignment else 'no solution'}")
+                expected = nodes.setdefault(search, creator.nodes)
+                assert creator.nodes == expected, f"{search} searches differ"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark crossword.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    domains = commands.add_parser(
+        "domains", help="set domains against bitset domains"
+    )
+    domains.add_argument("--structure", default="data/structure2.txt")
+    domains.add_argument("--words", default="data/words2.txt")
+    domains.add_argument("--sizes", type=int, nargs="+",
+                         default=[10_000, 300_000],
+                         help="sizes of larger synthetic dictionaries")
+    domains.add_argument("--max-sets-words", type=int, default=10_000,
+                         help="largest dictionary to run set domains on")
+    domains.set_defaults(run=bench_domains)
+
+    search = commands.add_parser(
+        "search", help="backtracking against maintaining arc consistency"
+    )
+    search.add_argument("--structure", default="data/structure2.txt")
+    search.add_argument("--words", default="data/words2.txt")
+    search.add_argument("--sizes", type=int, nargs="+", default=[10_000],
+                        help="sizes of larger synthetic dictionaries")
+    search.add_argument("--max-sets-words", type=int, default=10_000,
+                        help="largest dictionary to run set domains on")
+    search.set_defaults(run=bench_search)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
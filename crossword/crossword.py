@@ -131,3 +131,76 @@ class Crossword():
             v for v in self.variables
             if v != var and self.overlaps[v, var]
         )
+
+
+class WordIndex():
+
+    def __init__(self, words):
+        """
+        Number `words` by length and then alphabetically, so that a set of
+        words can be held as an integer whose bit i is set if it contains
+        word i, and index those bitsets by length and by the letter at
+        each position.
+        """
+        self.words = sorted(words, key=lambda word: (len(word), word))
+        self.positions = {word: i for i, word in enumerate(self.words)}
+
+        # Words of each length are numbered consecutively, so each set
+        # is built from a bitmap of just that length's words
+        self.lengths = dict()
+        self.letters = dict()
+        start = 0
+        while start < len(self.words):
+            length = len(self.words[start])
+            end = start
+            while end < len(self.words) and len(self.words[end]) == length:
+                end += 1
+            self.lengths[length] = (1 << end) - (1 << start)
+            for position in range(length):
+                bitmaps = dict()
+                for i in range(start, end):
+                    letter = self.words[i][position]
+                    if letter not in bitmaps:
+                        bitmaps[letter] = bytearray((end - start + 7) // 8)
+                    bitmaps[letter][(i - start) >> 3] |= 1 << ((i - start) & 7)
+                for letter, bitmap in bitmaps.items():
+                    self.letters[length, position, letter] = (
+                        int.from_bytes(bitmap, "little") << start
+                    )
+            start = end
+
+        # The letters that appear at each (length, position)
+        self.alphabets = dict()
+        for length, position, letter in self.letters:
+            self.alphabets.setdefault((length, position), []).append(letter)
+
+    def of_length(self, length):
+        """Return the bitset of words with `length` letters."""
+        return self.lengths.get(length, 0)
+
+    def with_letter(self, length, position, letter):
+        """Return the bitset of words of `length` with `letter` at `position`."""
+        return self.letters.get((length, position, letter), 0)
+
+    def supported(self, bits, length, position, other_length, other_position):
+        """
+        Return the bitset of words of `other_length` whose letter at
+        `other_position` is the letter at `position` of some word of
+        `length` in bitset `bits`.
+        """
+        result = 0
+        for letter in self.alphabets.get((length, position), ()):
+            if bits & self.letters[length, position, letter]:
+                result |= self.with_letter(other_length, other_position,
+                                           letter)
+        return result
+
+    def members(self, bits):
+        """Return the list of words in bitset `bits`, in index order."""
+        digits = bin(bits)[:1:-1]
+        members = []
+        i = digits.find("1")
+        while i != -1:
+            members.append(self.words[i])
+            i = digits.find("1", i + 1)
+        return members
@@ -1,4 +1,5 @@
-import sys
+import argparse
+from collections import deque
 
 from crossword import *
 
@@ -18,6 +19,13 @@ class CrosswordCreator():
             for var in self.crossword.variables
         }
 
+        # While maintaining arc consistency, the (variable, removed words)
+        # of every change to a domain, so that `undo` can restore them
+        self.trail = None
+
+        # Number of assignments tried by the search
+        self.nodes = 0
+
     def letter_grid(self, assignment):
         """
         Return 2D array representing a given assignment.
@@ -88,12 +96,17 @@ class CrosswordCreator():
 
         img.save(filename)
 
-    def solve(self):
+    def solve(self, search="backtrack"):
         """
-        Enforce node and arc consistency, and then solve the CSP.
+        Enforce node and arc consistency, and then solve the CSP by plain
+        backtracking, or by maintaining arc consistency if `search` is
+        "mac".
         """
         self.enforce_node_consistency()
         self.ac3()
+        if search == "mac":
+            self.trail = []
+            return self.maintain_arc_consistency(dict())
         return self.backtrack(dict())
 
     def enforce_node_consistency(self):
@@ -117,20 +130,39 @@ class CrosswordCreator():
         Return True if a revision was made to the domain of `x`; return
         False if no revision was made.
         """
-        revised = False
+        removed = set()
         if self.crossword.overlaps[x,y] is not None:
             x_index, y_index = self.crossword.overlaps[x,y]
 
-            for x_word in self.domains[x].copy():
-                if any([x_word[x_index]==y_word[y_index] for y_word in self.domains[y]]):
-                    revised = False
+            for x_word in self.domains[x]:
+                if not any([x_word[x_index]==y_word[y_index]
+                            for y_word in self.domains[y]]):
+                    removed.add(x_word)
+
+        if not removed:
+            return False
+        self.domains[x] -= removed
+        if self.trail is not None:
+            self.trail.append((x, removed))
+        return True
 
-                else:                
-                    self.domains[x].remove(x_word)
-                    revised = True
+    def restrict(self, var, value):
+        """
+        Reduce the domain of `var` to the single word `value`, recording
+        the words removed on the trail.
+        """
+        removed = self.domains[var] - {value}
+        self.domains[var] -= removed
+        self.trail.append((var, removed))
 
-        return revised
-    
+    def undo(self, mark):
+        """
+        Restore every word removed from a domain since the trail had
+        length `mark`.
+        """
+        while len(self.trail) > mark:
+            var, removed = self.trail.pop()
+            self.domains[var] |= removed
 
     def ac3(self, arcs=None):
         """
@@ -143,19 +175,32 @@ class CrosswordCreator():
         """
 
         if arcs is None:
-            arcs = []
-            for x in self.domains:
-                for y in self.domains:
-                    if x!=y:
-                        arcs.append((x,y))
-            
-        while arcs:
-            curr_x, curr_y = arcs.pop(0)
+            arcs = [
+                (x, y)
+                for x in self.domains
+                for y in self.crossword.neighbors(x)
+            ]
+
+        # A queue of arcs, with a set of those in it so none is queued twice
+        queue = deque()
+        queued = set()
+        for arc in arcs:
+            if arc not in queued:
+                queue.append(arc)
+                queued.add(arc)
+
+        while queue:
+            curr_x, curr_y = queue.popleft()
+            queued.discard((curr_x, curr_y))
             if self.revise(curr_x, curr_y):
-                for neighbor in self.crossword.neighbors(curr_x)-{curr_y}:
-                    arcs.append((curr_x, neighbor))
-                if len(self.domains[curr_x]) == 0:
+                if not self.domains[curr_x]:
                     return False
+
+                # Neighbors of x may have lost their support in x
+                for neighbor in self.crossword.neighbors(curr_x)-{curr_y}:
+                    if (neighbor, curr_x) not in queued:
+                        queue.append((neighbor, curr_x))
+                        queued.add((neighbor, curr_x))
         return True
 
     def assignment_complete(self, assignment):
@@ -203,6 +248,8 @@ class CrosswordCreator():
         the number of values they rule out for neighboring variables.
         The first value in the list, for example, should be the one
         that rules out the fewest values among the neighbors of `var`.
+        Ties are broken alphabetically, so the order does not depend on
+        how the set happens to be iterated.
         """
 
         '''we want to check how many neighbors of `var` contain some
@@ -218,7 +265,7 @@ class CrosswordCreator():
                     count+=1
             checker_dict[item]=count
 
-        return sorted(self.domains[var], key=lambda x: checker_dict[x])
+        return sorted(self.domains[var], key=lambda x: (checker_dict[x], x))
 
     def select_unassigned_variable(self, assignment):
         """
@@ -230,20 +277,17 @@ class CrosswordCreator():
         """
         possible_returns = []
         possible_values = []
+        assigned = set(assignment.values())
         for var in self.domains:
-            var_values=set()
             if var not in assignment:
                 possible_returns.append(var)
-            for value in self.domains[var]:
-                if value not in assignment.values():
-                    var_values.add(value)
-            possible_values.append(len(var_values))
+                possible_values.append(len(self.domains[var] - assigned))
 
         vars_remain_values = list(zip(possible_returns, possible_values))
 
-        return min(vars_remain_values, key=lambda x: (x[1], len(self.crossword.neighbors(x[0]))))[0]  
-            
-
+        return min(vars_remain_values, key=lambda x: (
+            x[1], -len(self.crossword.neighbors(x[0]))
+        ))[0]
 
     def backtrack(self, assignment):
         """
@@ -258,30 +302,153 @@ class CrosswordCreator():
             return assignment
         var = self.select_unassigned_variable(assignment)
         for value in self.order_domain_values(var, assignment):
+            self.nodes += 1
             assignment.update({var:value})
             if self.consistent(assignment):
                 result = self.backtrack(assignment)
                 if result is not None:
                     return result
-            else:
-                del assignment[var]
+            del assignment[var]
         return None
 
-def main():
+    def maintain_arc_consistency(self, assignment):
+        """
+        Using Backtracking Search, like `backtrack`, but after assigning
+        a word to a variable, restrict its domain to that word and make
+        its neighbors arc consistent with it again, so that the search
+        never tries words already ruled out. On backtracking, the trail
+        restores the domains as they were.
 
-    # Check usage
-    if len(sys.argv) not in [3, 4]:
-        sys.exit("Usage: python generate.py structure words [output]")
+        If no assignment is possible, return None.
+        """
+        if self.assignment_complete(assignment):
+            return assignment
+        var = self.select_unassigned_variable(assignment)
+        for value in self.order_domain_values(var, assignment):
+            self.nodes += 1
+            assignment[var] = value
+            if self.consistent(assignment):
+                mark = len(self.trail)
+                self.restrict(var, value)
+                arcs = [(neighbor, var)
+                        for neighbor in self.crossword.neighbors(var)]
+                if self.ac3(arcs):
+                    result = self.maintain_arc_consistency(assignment)
+                    if result is not None:
+                        return result
+                self.undo(mark)
+            del assignment[var]
+        return None
 
-    # Parse command-line arguments
-    structure = sys.argv[1]
-    words = sys.argv[2]
-    output = sys.argv[3] if len(sys.argv) == 4 else None
+
+class BitsetCrosswordCreator(CrosswordCreator):
+
+    def __init__(self, crossword, index=None):
+        """
+        Create new CSP crossword generate whose domains are bitsets over
+        `index`, a WordIndex of the crossword's words (built if None).
+        """
+        super().__init__(crossword)
+        self.index = index or WordIndex(crossword.words)
+        everything = (1 << len(self.index.words)) - 1
+        self.domains = {var: everything for var in self.crossword.variables}
+
+    def enforce_node_consistency(self):
+        """
+        Update `self.domains` such that each variable is node-consistent,
+        keeping only the words of its length.
+        """
+        for variable in self.domains:
+            self.domains[variable] &= self.index.of_length(variable.length)
+
+    def revise(self, x, y):
+        """
+        Make variable `x` arc consistent with variable `y`, keeping only
+        the words of `x` whose overlapping letter is the overlapping
+        letter of some word of `y`: one AND and OR per letter of `y`.
+
+        Return True if a revision was made to the domain of `x`; return
+        False if no revision was made.
+        """
+        if self.crossword.overlaps[x, y] is None:
+            return False
+        x_index, y_index = self.crossword.overlaps[x, y]
+        removed = self.domains[x] & ~self.index.supported(
+            self.domains[y], y.length, y_index, x.length, x_index
+        )
+        if not removed:
+            return False
+        self.domains[x] ^= removed
+        if self.trail is not None:
+            self.trail.append((x, removed))
+        return True
+
+    def restrict(self, var, value):
+        """
+        Reduce the domain of `var` to the single word `value`, recording
+        the words removed on the trail.
+        """
+        removed = self.domains[var] & ~(1 << self.index.positions[value])
+        self.domains[var] ^= removed
+        self.trail.append((var, removed))
+
+    def order_domain_values(self, var, assignment):
+        """
+        Return a list of the words in the domain of `var`, in order by
+        the number of unassigned neighbors whose domains also hold them,
+        and then alphabetically, as `CrosswordCreator` orders them.
+        """
+        neighbors = [
+            self.domains[neighbor]
+            for neighbor in self.crossword.neighbors(var)
+            if neighbor not in assignment
+        ]
+        words = self.index.members(self.domains[var])
+        return sorted(words, key=lambda word: sum(
+            domain >> self.index.positions[word] & 1 for domain in neighbors
+        ))
+
+    def select_unassigned_variable(self, assignment):
+        """
+        Return the unassigned variable with the fewest words left in its
+        domain that are not yet assigned, breaking ties by highest degree.
+        """
+        assigned = 0
+        for word in assignment.values():
+            assigned |= 1 << self.index.positions[word]
+        return min(
+            (var for var in self.domains if var not in assignment),
+            key=lambda var: ((self.domains[var] & ~assigned).bit_count(),
+                             -len(self.crossword.neighbors(var)))
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        usage="python generate.py structure words [output] "
+              "[--domains {sets,bitsets}] [--search {backtrack,mac}]"
+    )
+    parser.add_argument("structure")
+    parser.add_argument("words")
+    parser.add_argument("output", nargs="?")
+    parser.add_argument("--domains", choices=["sets", "bitsets"],
+                        default="sets",
+                        help="hold domains as sets of words or as bitsets "
+                             "over an index of every word")
+    parser.add_argument("--search", choices=["backtrack", "mac"],
+                        default="backtrack",
+                        help="plain backtracking, or maintaining arc "
+                             "consistency after each assignment")
+    args = parser.parse_args()
+    output = args.output
 
     # Generate crossword
-    crossword = Crossword(structure, words)
-    creator = CrosswordCreator(crossword)
-    assignment = creator.solve()
+    crossword = Crossword(args.structure, args.words)
+    if args.domains == "bitsets":
+        creator = BitsetCrosswordCreator(crossword)
+    else:
+        creator = CrosswordCreator(crossword)
+    assignment = creator.solve(args.search)
 
     # Print result
     if assignment is None:
@@ -0,0 +1,162 @@
+import json
+import os
+import socketserver
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import degrees
+
+
+def init_worker(directory):
+    """
+    Map the graph snapshot into a worker process. Every worker maps the
+    same read-only files, so the operating system shares their pages.
+    """
+    degrees.load_data(directory, csr=True)
+
+
+def parse_query(line):
+    """
+    Returns (source, target) from a line that is either a JSON object with
+    "source" and "target" keys or two names separated by a tab.
+    Returns None for a blank line.
+    """
+    line = line.strip()
+    if not line:
+        return None
+    if line.startswith("{"):
+        query = json.loads(line)
+        return query["source"], query["target"]
+    source, target = line.split("\t")
+    return source, target
+
+
+def resolve(name):
+    """
+    Returns the person_id for a name or person_id without asking the
+    user, taking the most popular match, or raises ValueError if there
+    is none.
+    """
+    if degrees.graph.person_index(name) is not None:
+        return name
+    person_id = degrees.person_id_for_name(name, interactive=False)
+    if person_id is None:
+        raise ValueError(f"person not found: {name}")
+    return person_id
+
+
+def answer(query):
+    """
+    Returns the JSON-serialisable result of one (source, target) query.
+    """
+    source, target = query
+    result = {"source": source, "target": target}
+    try:
+        source_id, target_id = resolve(source), resolve(target)
+    except ValueError as e:
+        result["error"] = str(e)
+        return result
+
+    path = degrees.shortest_path(source_id, target_id)
+    if path is None:
+        result["degrees"] = None
+        result["path"] = None
+        return result
+
+    result["degrees"] = len(path)
+    result["path"] = [
+        {
+            "movie_id": movie_id,
+            "movie": degrees.get_movie(movie_id)["title"],
+            "person_id": person_id,
+            "person": degrees.get_person(person_id)["name"],
+        }
+        for movie_id, person_id in path
+    ]
+    return result
+
+
+def make_pool(directory, workers=None):
+    """
+    Returns a process pool whose workers each map the graph for
+    `directory`, writing its snapshot first if there is none yet.
+    """
+    degrees.load_data(directory, csr=True)
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_worker,
+        initargs=(directory,)
+    )
+
+
+def run_batch(directory, infile, outfile, workers=None):
+    """
+    Answer every query in `infile`, writing one JSON result per line to
+    `outfile` in the same order, and report queries per second on stderr.
+    A line that is not a valid query gets an error result in its place.
+    """
+    workers = workers or os.cpu_count()
+    lines = []
+    for line in infile:
+        try:
+            query = parse_query(line)
+        except (ValueError, KeyError) as e:
+            lines.append({"error": f"bad query: {e}"})
+        else:
+            if query is not None:
+                lines.append(query)
+    queries = [line for line in lines if isinstance(line, tuple)]
+    start = time.perf_counter()
+    with make_pool(directory, workers) as pool:
+        chunksize = max(1, len(queries) // (4 * workers))
+        results = pool.map(answer, queries, chunksize=chunksize)
+        for line in lines:
+            result = next(results) if isinstance(line, tuple) else line
+            outfile.write(json.dumps(result) + "\n")
+    report(len(queries), time.perf_counter() - start,
+           bad=len(lines) - len(queries))
+
+
+def serve(directory, port, workers=None, host="127.0.0.1"):
+    """
+    Answer queries sent as lines over TCP connections to `host`:`port`,
+    replying to each with a JSON line. Each connection is answered in
+    order; separate connections run in parallel on one shared pool.
+    """
+    pool = make_pool(directory, workers)
+
+    class Handler(socketserver.StreamRequestHandler):
+
+        def handle(self):
+            count = bad = 0
+            start = time.perf_counter()
+            for line in self.rfile:
+                try:
+                    query = parse_query(line.decode("utf-8"))
+                except (ValueError, KeyError) as e:
+                    result = {"error": f"bad query: {e}"}
+                    bad += 1
+                else:
+                    if query is None:
+                        continue
+                    result = pool.submit(answer, query).result()
+                    count += 1
+                self.wfile.write((json.dumps(result) + "\n").encode("utf-8"))
+            report(count, time.perf_counter() - start, bad=bad)
+
+    with socketserver.ThreadingTCPServer((host, port), Handler) as server:
+        print(f"Serving on {host}:{port}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            pool.shutdown()
+
+
+def report(count, seconds, bad=0):
+    rate = count / seconds if seconds else 0
+    malformed = f", and {bad} malformed lines" if bad else ""
+    print(f"{count} queries in {seconds:.3f}s ({rate:.1f} queries/s)"
+          f"{malformed}", file=sys.stderr)
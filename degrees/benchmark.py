@@ -0,0 +1,262 @@
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import degrees
+from synthetic import reset_data, synthetic_data, write_synthetic_csv
+from util import QueueFrontier, HashedQueueFrontier, NameIndex
+
+
+def time_search(source, target, frontier_class):
+    start = time.perf_counter()
+    degrees.shortest_path(source, target, frontier_class=frontier_class)
+    return time.perf_counter() - start
+
+
+def check_path(source, target, path):
+    """
+    Raise AssertionError unless `path` is a valid chain of co-stars
+    from `source` to `target`.
+    """
+    person = source
+    for movie, next_person in path:
+        assert movie in degrees.people[person]["movies"]
+        assert movie in degrees.people[next_person]["movies"]
+        person = next_person
+    assert person == target
+
+
+def bench_frontiers(args):
+    sizes = sorted({min(args.edges, args.legacy_edges), args.edges})
+    for edges in sizes:
+        source, target = synthetic_data(edges)
+        print(f"{edges} edges, {len(degrees.people)} people, "
+              f"{len(degrees.movies)} movies")
+        hashed = time_search(source, target, HashedQueueFrontier)
+        print(f"  HashedQueueFrontier: {hashed:.3f}s")
+        if edges <= args.legacy_edges:
+            legacy = time_search(source, target, QueueFrontier)
+            print(f"  QueueFrontier:       {legacy:.3f}s "
+                  f"({legacy / hashed:.1f}x slower)")
+        else:
+            print("  QueueFrontier:       skipped (quadratic)")
+
+
+def bench_bidirectional(args):
+    """
+    Run random queries through both searches, checking that they agree
+    on the number of degrees and that every path is valid.
+    """
+    synthetic_data(args.edges, stars_per_movie=args.stars_per_movie)
+    rng = random.Random(1)
+    people = list(degrees.people)
+    timings = {False: 0.0, True: 0.0}
+
+    for _ in range(args.queries):
+        source, target = rng.choice(people), rng.choice(people)
+        lengths = {}
+        for bidirectional in timings:
+            start = time.perf_counter()
+            path = degrees.shortest_path(source, target,
+                                         bidirectional=bidirectional)
+            timings[bidirectional] += time.perf_counter() - start
+            if path is not None:
+                check_path(source, target, path)
+            lengths[bidirectional] = None if path is None else len(path)
+        assert lengths[False] == lengths[True], (source, target, lengths)
+
+    print(f"{args.queries} queries on {args.edges} edges, all paths agree")
+    print(f"  breadth-first:  {timings[False]:.3f}s")
+    print(f"  bidirectional:  {timings[True]:.3f}s")
+
+
+def bench_representation(args):
+    """
+    Load the same dataset as nested dicts and as a CSR graph, reporting
+    memory held after loading and time for the same random queries.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = args.directory
+        if directory is None:
+            directory = tmp
+            write_synthetic_csv(directory, args.edges,
+                                stars_per_movie=args.stars_per_movie)
+
+        results = {}
+        for csr in (False, True):
+            reset_data()
+            tracemalloc.start()
+            start = time.perf_counter()
+            degrees.load_data(directory, csr=csr, cache=False)
+            load_time = time.perf_counter() - start
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+
+            if csr:
+                # Write a snapshot, then time starting up from it
+                degrees.load_data(directory, csr=True)
+                start = time.perf_counter()
+                degrees.load_data(directory, csr=True)
+                snapshot_time = time.perf_counter() - start
+
+            if csr:
+                person_ids = degrees.graph.person_ids
+            else:
+                person_ids = list(degrees.people)
+            rng = random.Random(1)
+            pairs = [(rng.choice(person_ids), rng.choice(person_ids))
+                     for _ in range(args.queries)]
+
+            lengths = []
+            start = time.perf_counter()
+            for source, target in pairs:
+                path = degrees.shortest_path(source, target)
+                lengths.append(None if path is None else len(path))
+            query_time = time.perf_counter() - start
+
+            name = "CSR arrays" if csr else "nested dicts"
+            results[csr] = lengths
+            print(f"{name}:")
+            print(f"  load:    {load_time:.3f}s")
+            if csr:
+                print(f"  mapped:  {snapshot_time:.3f}s from snapshot")
+            print(f"  memory:  {memory / 2 ** 20:.1f} MiB")
+            print(f"  queries: {query_time / args.queries * 1000:.2f}ms each")
+
+        assert results[False] == results[True]
+        reset_data()
+
+
+def synthetic_names(count, seed=0):
+    """
+    Returns `count` random "First Last" names built from a few thousand
+    first names and surnames, so that many names share parts as real
+    ones do.
+    """
+    rng = random.Random(seed)
+    syllables = [onset + vowel + coda
+                 for onset in ["", "b", "ch", "d", "f", "g", "h", "j", "k",
+                               "l", "m", "n", "p", "r", "s", "st", "t", "v",
+                               "w", "z"]
+                 for vowel in "aeiouy"
+                 for coda in ["", "", "n", "r", "s", "l"]]
+
+    def word(parts):
+        return "".join(rng.choice(syllables)
+                       for _ in range(parts)).capitalize()
+
+    firsts = [word(rng.randint(1, 3)) for _ in range(5_000)]
+    lasts = [word(rng.randint(2, 4)) for _ in range(100_000)]
+    return [f"{rng.choice(firsts)} {rng.choice(lasts)}" for _ in range(count)]
+
+
+def bench_names(args):
+    """
+    Time exact, prefix and fuzzy lookups, and searches, in a NameIndex
+    over the people of `args.directory` or else `args.people` synthetic
+    names, ranked by how many movies they star in or at random. Fuzzy
+    lookups and searches are for names one and two edits from a real
+    one.
+    """
+    rng = random.Random(1)
+    if args.directory:
+        with open(os.path.join(args.directory, "people.csv"),
+                  encoding="utf-8") as f:
+            people = {row["id"]: row["name"] for row in csv.DictReader(f)}
+        counts = {}
+        with open(os.path.join(args.directory, "stars.csv"),
+                  encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                counts[row["person_id"]] = counts.get(row["person_id"], 0) + 1
+        person_ids = list(people)
+        names = list(people.values())
+        popularity = [counts.get(person_id, 0) for person_id in person_ids]
+    else:
+        names = synthetic_names(args.people)
+        person_ids = [str(i) for i in range(len(names))]
+        popularity = [rng.randint(0, 50) for _ in names]
+
+    start = time.perf_counter()
+    index = NameIndex(names, person_ids, popularity)
+    print(f"{len(names)} names, sorted in "
+          f"{time.perf_counter() - start:.2f}s")
+    start = time.perf_counter()
+    index.build_trigrams()
+    print(f"  trigram index built in {time.perf_counter() - start:.2f}s")
+
+    queries = rng.sample(names, min(args.queries, len(names)))
+    # Names with a letter dropped, and with another one changed too
+    typos, typos2 = [], []
+    for name in queries:
+        i = rng.randrange(len(name))
+        typos.append(name[:i] + name[i + 1:])
+        j = rng.randrange(len(typos[-1]))
+        typos2.append(typos[-1][:j] + "q" + typos[-1][j + 1:])
+
+    lookups = [
+        ("exact", lambda name: index.exact(name), queries),
+        ("prefix", lambda name: index.prefix(name[:6]), queries),
+        ("fuzzy", lambda name: index.fuzzy(name), typos),
+        ("fuzzy 2", lambda name: index.fuzzy(name), typos2),
+        ("search", lambda name: index.search(name), typos),
+        ("search 1", lambda name: index.search(name, limit=1), typos),
+        ("search 2", lambda name: index.search(name, limit=1), typos2),
+    ]
+    for kind, lookup, inputs in lookups:
+        start = time.perf_counter()
+        found = sum(1 for name in inputs if lookup(name))
+        elapsed = time.perf_counter() - start
+        print(f"  {kind:9}{elapsed / len(inputs) * 1000:.3f}ms each, "
+              f"{found}/{len(inputs)} found")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark degrees search.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    frontier = commands.add_parser(
+        "frontier", help="compare frontier implementations"
+    )
+    frontier.add_argument("--edges", type=int, default=1_000_000,
+                          help="number of (person, movie) edges")
+    frontier.add_argument("--legacy-edges", type=int, default=10_000,
+                          help="largest graph to run the list frontier on")
+    frontier.set_defaults(run=bench_frontiers)
+
+    bidirectional = commands.add_parser(
+        "bidirectional", help="check and time bidirectional search"
+    )
+    bidirectional.add_argument("--edges", type=int, default=50_000)
+    bidirectional.add_argument("--stars-per-movie", type=int, default=3)
+    bidirectional.add_argument("--queries", type=int, default=50)
+    bidirectional.set_defaults(run=bench_bidirectional)
+
+    representation = commands.add_parser(
+        "representation", help="compare dict and CSR graph memory and speed"
+    )
+    representation.add_argument("--directory",
+                                help="dataset to load instead of a "
+                                     "synthetic one")
+    representation.add_argument("--edges", type=int, default=300_000)
+    representation.add_argument("--stars-per-movie", type=int, default=4)
+    representation.add_argument("--queries", type=int, default=20)
+    representation.set_defaults(run=bench_representation)
+
+    names = commands.add_parser("names", help="time name index lookups")
+    names.add_argument("--directory",
+                       help="dataset whose people to index instead of "
+                            "synthetic names")
+    names.add_argument("--people", type=int, default=1_000_000)
+    names.add_argument("--queries", type=int, default=500)
+    names.set_defaults(run=bench_names)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,12 @@
+import argparse
 import csv
 import sys
 
-from util import Node, StackFrontier, QueueFrontier
+import numpy as np
+
+from graph import CSRGraph
+from util import Node, HashedQueueFrontier
+from util import NameIndex
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -12,11 +17,32 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Compact integer-indexed graph, used instead of the dicts above if loaded
+graph = None
+
+# Exact, prefix and fuzzy lookup of person_ids by name, built by load_data
+name_index = None
 
-def load_data(directory):
+
+def load_data(directory, csr=False, cache=True):
     """
     Load data from CSV files into memory.
+    If `csr` is True, load them into a compact `CSRGraph` instead, mapping
+    it from the on-disk snapshot unless `cache` is False.
+    Either way, index people's names, with the trigrams used by fuzzy
+    lookups, so that no lookup has to build them.
     """
+    global graph, name_index
+    if csr:
+        graph = CSRGraph.open(directory, cache=cache)
+        name_index = NameIndex(
+            graph.person_names, graph.person_ids,
+            np.diff(graph.person_indptr), order=graph.name_order,
+            trigrams=(graph.gram_keys, graph.gram_indptr,
+                      graph.gram_postings, graph.gram_counts)
+        )
+        return
+
     # Load people
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
@@ -51,25 +77,72 @@ def load_data(directory):
             except KeyError:
                 pass
 
+    person_ids = list(people)
+    name_index = NameIndex(
+        [people[person_id]["name"] for person_id in person_ids],
+        person_ids,
+        [len(people[person_id]["movies"]) for person_id in person_ids]
+    )
+    name_index.build_trigrams()
+
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser(
+        usage="python degrees.py [directory] [--bidirectional] "
+              "[--csr [--no-cache]] [--batch FILE | --serve PORT | --histogram]"
+    )
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--bidirectional", action="store_true",
+                        help="search from both people at once")
+    parser.add_argument("--csr", action="store_true",
+                        help="load the data into a compact array graph")
+    parser.add_argument("--no-cache", dest="cache", action="store_false",
+                        help="parse the CSV files even if a snapshot of "
+                             "them exists")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="answer every query in FILE ('-' for stdin) "
+                             "as JSON lines")
+    parser.add_argument("--serve", metavar="PORT", type=int,
+                        help="answer queries sent to a local TCP port")
+    parser.add_argument("--histogram", action="store_true",
+                        help="report how many people are each number of "
+                             "degrees from one person")
+    parser.add_argument("--workers", type=int,
+                        help="processes for --batch and --serve")
+    args = parser.parse_args()
+
+    if args.batch:
+        import batch
+        with (sys.stdin if args.batch == "-" else open(args.batch)) as f:
+            batch.run_batch(args.directory, f, sys.stdout, args.workers)
+        return
+    if args.serve:
+        import batch
+        batch.serve(args.directory, args.serve, args.workers)
+        return
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    load_data(args.directory, csr=args.csr, cache=args.cache)
     print("Data loaded.")
 
     source = person_id_for_name(input("Name: "))
     if source is None:
         sys.exit("Person not found.")
+
+    if args.histogram:
+        histogram = distance_histogram(source)
+        reachable = sum(histogram)
+        print(f"{reachable} people connected to {get_person(source)['name']}.")
+        for degrees, count in enumerate(histogram):
+            print(f"{degrees}: {count} ({count / reachable:.2%})")
+        return
+
     target = person_id_for_name(input("Name: "))
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    path = shortest_path(source, target, bidirectional=args.bidirectional)
 
     if path is None:
         print("Not connected.")
@@ -78,21 +151,35 @@ def main():
         print(f"{degrees} degrees of separation.")
         path = [(None, source)] + path
         for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
+            person1 = get_person(path[i][1])["name"]
+            person2 = get_person(path[i + 1][1])["name"]
+            movie = get_movie(path[i + 1][0])["title"]
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def shortest_path(source, target, frontier_class=HashedQueueFrontier,
+                  bidirectional=False):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
+    `frontier_class` may be any queue frontier from util; the hashed one
+    keeps `remove` and `contains_state` O(1) on large datasets. It only
+    applies to the breadth-first search of the dicts.
+    If `bidirectional` is True, search from both ends instead.
+    If the CSR graph is loaded, either search runs on its arrays.
+
     If no possible path, returns None.
     """
+    if graph is not None:
+        if bidirectional:
+            return graph.bidirectional_shortest_path(source, target)
+        return graph.shortest_path(source, target)
+    if bidirectional:
+        return bidirectional_shortest_path(source, target)
+
     explored_set=set()
-    frontier=QueueFrontier()
+    frontier=frontier_class()
     node=Node(state=source, parent=None, action=None)
 
     frontier.add(node)
@@ -119,18 +206,153 @@ def shortest_path(source, target):
                     neighbor=Node(state=person, parent=node, action=movie)
                     frontier.add(neighbor)
 
-def person_id_for_name(name):
+
+def single_source_paths(source):
+    """
+    Returns (distances, parents) dictionaries from one breadth-first search
+    from `source`: `distances` maps every reachable person_id to its
+    degrees of separation, and `parents` maps each of them except the
+    source to the (movie_id, person_id) one step closer to the source.
+
+    Any path can then be rebuilt with `path_from_parents`.
+    """
+    if graph is not None:
+        return graph.parents(source)
+
+    distances = {source: 0}
+    parents = {}
+    level = [source]
+    while level:
+        next_level = []
+        for person in level:
+            for (movie, neighbor) in neighbors_for_person(person):
+                if neighbor not in distances:
+                    distances[neighbor] = distances[person] + 1
+                    parents[neighbor] = (movie, person)
+                    next_level.append(neighbor)
+        level = next_level
+    return distances, parents
+
+
+def path_from_parents(parents, target):
+    """
+    Returns the list of (movie_id, person_id) pairs from the source of
+    `single_source_paths` to `target`, in time proportional to its length.
+    """
+    path = []
+    while target in parents:
+        movie, parent = parents[target]
+        path.append((movie, target))
+        target = parent
+    path.reverse()
+    return path
+
+
+def distance_histogram(source):
+    """
+    Returns a list whose entry d is the number of people exactly
+    d degrees of separation from `source`.
+    """
+    if graph is not None:
+        return graph.histogram(source)
+
+    distances = single_source_paths(source)[0]
+    histogram = [0] * (max(distances.values()) + 1)
+    for distance in distances.values():
+        histogram[distance] += 1
+    return histogram
+
+
+def bidirectional_shortest_path(source, target):
+    """
+    Returns the same shortest list of (movie_id, person_id) pairs as
+    `shortest_path`, searching breadth-first from the source and the
+    target at once and always expanding a whole level of the smaller side.
+
+    If no possible path, returns None.
+    """
+    if source == target:
+        return []
+
+    # Each side maps a reached person to (movie_id, person_id) one step
+    # closer to where that side started
+    forward = {source: None}
+    backward = {target: None}
+    forward_level = [source]
+    backward_level = [target]
+
+    while forward_level and backward_level:
+        if len(forward_level) <= len(backward_level):
+            forward_level, meeting = expand_level(
+                forward_level, forward, backward
+            )
+        else:
+            backward_level, meeting = expand_level(
+                backward_level, backward, forward
+            )
+
+        if meeting is not None:
+            path = []
+            person = meeting
+            while forward[person] is not None:
+                movie, parent = forward[person]
+                path.append((movie, person))
+                person = parent
+            path.reverse()
+
+            person = meeting
+            while backward[person] is not None:
+                movie, person = backward[person]
+                path.append((movie, person))
+            return path
+
+    return None
+
+
+def expand_level(level, parents, other_parents):
+    """
+    Expands every person in `level`, recording newly reached people in
+    `parents`.
+
+    Returns the next level and the first person of it already reached
+    by the other search, or None if the searches have not met.
+    """
+    next_level = []
+    for person in level:
+        for (movie, neighbor) in neighbors_for_person(person):
+            if neighbor not in parents:
+                parents[neighbor] = (movie, person)
+                next_level.append(neighbor)
+                if neighbor in other_parents:
+                    return next_level, neighbor
+    return next_level, None
+
+
+def person_id_for_name(name, interactive=True):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
+
+    If `interactive` is False, never prompt: pick the most popular person
+    with that name, or else the best prefix or fuzzy match for it.
     """
-    person_ids = list(names.get(name.lower(), set()))
+    person_ids = name_index.exact(name)
+    if not interactive:
+        if not person_ids:
+            person_ids = name_index.search(name, limit=1)
+        return person_ids[0] if person_ids else None
+
     if len(person_ids) == 0:
+        suggestions = name_index.search(name, limit=5)
+        if suggestions:
+            suggested = ", ".join(get_person(person_id)["name"]
+                              for person_id in suggestions)
+            print(f"Did you mean: {suggested}?")
         return None
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
         for person_id in person_ids:
-            person = people[person_id]
+            person = get_person(person_id)
             name = person["name"]
             birth = person["birth"]
             print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
@@ -145,6 +367,26 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
+def get_person(person_id):
+    """
+    Returns the dictionary of name and birth for a person_id,
+    from whichever representation is loaded.
+    """
+    if graph is not None:
+        return graph.person(person_id)
+    return people[person_id]
+
+
+def get_movie(movie_id):
+    """
+    Returns the dictionary of title and year for a movie_id,
+    from whichever representation is loaded.
+    """
+    if graph is not None:
+        return graph.movie(movie_id)
+    return movies[movie_id]
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
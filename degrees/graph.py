@@ -0,0 +1,434 @@
+import bisect
+import csv
+import json
+import os
+
+import numpy as np
+
+from util import trigram_index
+
+# Directory, inside a dataset directory, holding its graph snapshot
+CACHE_DIRECTORY = ".degrees_cache"
+
+# Bumped whenever the snapshot layout changes
+CACHE_VERSION = 2
+
+
+class CSRGraph():
+    """
+    Compact form of the degrees dataset.
+
+    People and movies are interned to dense integers (their row in
+    people.csv and movies.csv), and who starred in what is stored as two
+    compressed-sparse-row adjacency arrays: person -> movies and
+    movie -> stars. Searches run level by level on those arrays instead
+    of on per-person Python sets. The trigram index of people's names,
+    for fuzzy name lookups, is kept with them.
+    """
+
+    # Arrays making up a graph, in the order the constructor takes them
+    ARRAYS = (
+        "person_ids", "person_names", "person_births",
+        "movie_ids", "movie_titles", "movie_years",
+        "person_indptr", "person_movies", "movie_indptr", "movie_stars",
+        "person_order", "movie_order", "name_order",
+        "gram_keys", "gram_indptr", "gram_postings", "gram_counts",
+    )
+
+    def __init__(self, person_ids, person_names, person_births,
+                 movie_ids, movie_titles, movie_years,
+                 person_indptr, person_movies, movie_indptr, movie_stars,
+                 person_order, movie_order, name_order,
+                 gram_keys, gram_indptr, gram_postings, gram_counts):
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.movie_years = movie_years
+        self.person_indptr = person_indptr
+        self.person_movies = person_movies
+        self.movie_indptr = movie_indptr
+        self.movie_stars = movie_stars
+
+        # Permutations sorting people by id, movies by id and people by
+        # lowercase name, so lookups are a binary search
+        self.person_order = person_order
+        self.movie_order = movie_order
+        self.name_order = name_order
+
+        # Trigram index of the lowercase names, as `util.trigram_index`
+        # returns it
+        self.gram_keys = gram_keys
+        self.gram_indptr = gram_indptr
+        self.gram_postings = gram_postings
+        self.gram_counts = gram_counts
+
+    @classmethod
+    def from_csv(cls, directory):
+        """
+        Load people.csv, movies.csv and stars.csv from `directory`.
+        Star rows naming an unknown person or movie are skipped, and
+        duplicate rows are kept once, as `degrees.load_data` does.
+        """
+        person_ids, person_names, person_births = [], [], []
+        with open(f"{directory}/people.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                person_ids.append(row["id"])
+                person_names.append(row["name"])
+                person_births.append(row["birth"])
+
+        movie_ids, movie_titles, movie_years = [], [], []
+        with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                movie_ids.append(row["id"])
+                movie_titles.append(row["title"])
+                movie_years.append(row["year"])
+
+        person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+        movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+        star_people, star_movies = [], []
+        with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                person = person_index.get(row["person_id"])
+                movie = movie_index.get(row["movie_id"])
+                if person is not None and movie is not None:
+                    star_people.append(person)
+                    star_movies.append(movie)
+
+        star_people = np.array(star_people, dtype=np.int64)
+        star_movies = np.array(star_movies, dtype=np.int64)
+        pairs = np.unique(star_people * max(len(movie_ids), 1) + star_movies)
+        star_people, star_movies = np.divmod(pairs, max(len(movie_ids), 1))
+
+        person_indptr, person_movies = build_csr(
+            star_people, star_movies, len(person_ids)
+        )
+        movie_indptr, movie_stars = build_csr(
+            star_movies, star_people, len(movie_ids)
+        )
+        keys = [name.lower() for name in person_names]
+        name_order = sorted_order(keys)
+        return cls(
+            StringTable.from_list(person_ids),
+            StringTable.from_list(person_names),
+            StringTable.from_list(person_births),
+            StringTable.from_list(movie_ids),
+            StringTable.from_list(movie_titles),
+            StringTable.from_list(movie_years),
+            person_indptr, person_movies, movie_indptr, movie_stars,
+            sorted_order(person_ids),
+            sorted_order(movie_ids),
+            name_order,
+            *trigram_index([keys[i] for i in name_order.tolist()]),
+        )
+
+    @classmethod
+    def open(cls, directory, cache=True):
+        """
+        Load the graph for the CSV files in `directory`.
+
+        If `cache` is True, reuse the snapshot in `directory`/.degrees_cache
+        when it was written for CSV files with the same modification times
+        and sizes, memory-mapping its arrays instead of parsing the CSVs.
+        Otherwise parse the CSVs and write a new snapshot.
+        """
+        if not cache:
+            return cls.from_csv(directory)
+
+        path = os.path.join(directory, CACHE_DIRECTORY)
+        stamp = csv_stamp(directory)
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                if json.load(f) == stamp:
+                    return cls.load(path)
+        except (OSError, ValueError):
+            pass
+
+        graph = cls.from_csv(directory)
+        try:
+            graph.save(path, stamp)
+        except OSError:
+            pass
+        return graph
+
+    @classmethod
+    def load(cls, path):
+        """Memory-map a graph previously written by `save`."""
+        arrays = {}
+        for name in cls.ARRAYS:
+            arrays[name] = np.load(os.path.join(path, f"{name}.npy"),
+                                   mmap_mode="r")
+        for name in cls.ARRAYS[:6]:
+            arrays[name] = StringTable(
+                arrays[name],
+                np.load(os.path.join(path, f"{name}.offsets.npy"),
+                        mmap_mode="r")
+            )
+        return cls(*(arrays[name] for name in cls.ARRAYS))
+
+    def save(self, path, stamp):
+        """
+        Write the graph's arrays to directory `path` as .npy files, with
+        `stamp` in meta.json. meta.json is written last, so a snapshot
+        interrupted part way is never loaded.
+        """
+        os.makedirs(path, exist_ok=True)
+        meta = os.path.join(path, "meta.json")
+        if os.path.exists(meta):
+            os.remove(meta)
+        for name in self.ARRAYS:
+            array = getattr(self, name)
+            if isinstance(array, StringTable):
+                np.save(os.path.join(path, f"{name}.offsets.npy"),
+                        array.offsets)
+                array = array.blob
+            np.save(os.path.join(path, f"{name}.npy"), array)
+        with open(meta, "w") as f:
+            json.dump(stamp, f)
+
+    def person_index(self, person_id):
+        """Returns the integer index of a person_id, or None."""
+        return find(self.person_ids, self.person_order, person_id)
+
+    def movie_index(self, movie_id):
+        """Returns the integer index of a movie_id, or None."""
+        return find(self.movie_ids, self.movie_order, movie_id)
+
+    def person(self, person_id):
+        """Returns a dictionary of name and birth for a person_id."""
+        i = self.person_index(person_id)
+        return {"name": self.person_names[i], "birth": self.person_births[i]}
+
+    def movie(self, movie_id):
+        """Returns a dictionary of title and year for a movie_id."""
+        i = self.movie_index(movie_id)
+        return {"title": self.movie_titles[i], "year": self.movie_years[i]}
+
+    def search(self, source, target=None):
+        """
+        Breadth-first search from integer person `source`, one whole level
+        at a time. Stops once `target` has been reached, if given.
+
+        Returns arrays (distance, parent, via) indexed by person: the number
+        of degrees from the source (-1 if not reached), the previous person
+        on a shortest path and the movie that links them.
+        """
+        n_people = len(self.person_ids)
+        distance = np.full(n_people, -1, dtype=np.int32)
+        parent = np.full(n_people, -1, dtype=np.int32)
+        via = np.full(n_people, -1, dtype=np.int32)
+        seen_movies = np.zeros(len(self.movie_ids), dtype=bool)
+
+        distance[source] = 0
+        level = np.array([source], dtype=np.int64)
+        while level.size and (target is None or distance[target] < 0):
+            level = self.expand(level, distance, parent, via, seen_movies)
+
+        return distance, parent, via
+
+    def expand(self, level, distance, parent, via, seen_movies):
+        """
+        Reaches the people one degree beyond integer people `level`,
+        recording them in the arrays of a `search` and marking the
+        movies used in `seen_movies`. Returns the newly reached people.
+        """
+
+        # Movies of this level not already reached from an earlier one,
+        # each remembering the first person who reached it
+        owner, movies = gather(self.person_indptr, self.person_movies, level)
+        fresh = ~seen_movies[movies]
+        movies, first = np.unique(movies[fresh], return_index=True)
+        owner = level[owner[fresh][first]]
+        seen_movies[movies] = True
+
+        # Stars of those movies who have not been reached yet
+        movie_pos, stars = gather(self.movie_indptr, self.movie_stars, movies)
+        fresh = distance[stars] < 0
+        stars, first = np.unique(stars[fresh], return_index=True)
+        movie_pos = movie_pos[fresh][first]
+
+        distance[stars] = distance[level[0]] + 1
+        parent[stars] = owner[movie_pos]
+        via[stars] = movies[movie_pos]
+        return stars
+
+    def bidirectional_shortest_path(self, source, target):
+        """
+        Returns the same shortest list of (movie_id, person_id) pairs as
+        `shortest_path`, searching level by level from the source and the
+        target at once and always expanding the smaller level.
+
+        If no possible path, returns None.
+        """
+        source = self.person_index(source)
+        target = self.person_index(target)
+        if source == target:
+            return []
+
+        n_people = len(self.person_ids)
+        sides = []
+        for start in (source, target):
+            distance = np.full(n_people, -1, dtype=np.int32)
+            distance[start] = 0
+            sides.append({
+                "level": np.array([start], dtype=np.int64),
+                "distance": distance,
+                "parent": np.full(n_people, -1, dtype=np.int32),
+                "via": np.full(n_people, -1, dtype=np.int32),
+                "seen_movies": np.zeros(len(self.movie_ids), dtype=bool),
+            })
+        forward, backward = sides
+
+        while forward["level"].size and backward["level"].size:
+            side, other = sorted(sides, key=lambda side: side["level"].size)
+            side["level"] = self.expand(
+                side["level"], side["distance"], side["parent"],
+                side["via"], side["seen_movies"]
+            )
+
+            # Once the sides meet, the meeting person closest to the other
+            # side's start lies on a shortest path
+            met = side["level"][other["distance"][side["level"]] >= 0]
+            if met.size:
+                meeting = met[np.argmin(other["distance"][met])]
+                path = self.path(forward["parent"], forward["via"], meeting)
+                person = meeting
+                parent, via = backward["parent"], backward["via"]
+                while parent[person] >= 0:
+                    path.append((self.movie_ids[via[person]],
+                                 self.person_ids[parent[person]]))
+                    person = parent[person]
+                return path
+
+        return None
+
+    def shortest_path(self, source, target):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target person_id.
+
+        If no possible path, returns None.
+        """
+        source = self.person_index(source)
+        target = self.person_index(target)
+        distance, parent, via = self.search(source, target)
+        if distance[target] < 0:
+            return None
+        return self.path(parent, via, target)
+
+    def path(self, parent, via, target):
+        """
+        Returns the list of (movie_id, person_id) pairs leading to integer
+        person `target` in the (parent, via) arrays of a `search`.
+        """
+        path = []
+        person = target
+        while parent[person] >= 0:
+            path.append((self.movie_ids[via[person]], self.person_ids[person]))
+            person = parent[person]
+        path.reverse()
+        return path
+
+    def parents(self, source):
+        """
+        Returns (distances, parents) dictionaries for everyone reachable
+        from person_id `source`, as `degrees.single_source_paths` does.
+        """
+        distance, parent, via = self.search(self.person_index(source))
+        distances, parents = {}, {}
+        for person in np.flatnonzero(distance >= 0):
+            person_id = self.person_ids[person]
+            distances[person_id] = int(distance[person])
+            if parent[person] >= 0:
+                parents[person_id] = (self.movie_ids[via[person]],
+                                      self.person_ids[parent[person]])
+        return distances, parents
+
+    def histogram(self, source):
+        """
+        Returns a list whose entry d is the number of people exactly d
+        degrees from person_id `source`.
+        """
+        distance = self.search(self.person_index(source))[0]
+        return np.bincount(distance[distance >= 0]).tolist()
+
+
+class StringTable():
+    """
+    Read-only sequence of strings stored as one UTF-8 byte array plus an
+    array of offsets, so that it can be saved to and mapped from disk.
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def from_list(cls, strings):
+        encoded = [string.encode("utf-8") for string in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(string) for string in encoded], out=offsets[1:])
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(blob, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.blob[start:end].tobytes().decode("utf-8")
+
+
+def csv_stamp(directory):
+    """
+    Returns the modification time and size of each CSV file in
+    `directory`, which a snapshot must match to be reused.
+    """
+    stamp = {"version": CACHE_VERSION}
+    for filename in ("people.csv", "movies.csv", "stars.csv"):
+        stat = os.stat(os.path.join(directory, filename))
+        stamp[filename] = [stat.st_mtime_ns, stat.st_size]
+    return stamp
+
+
+def sorted_order(keys):
+    """Returns the permutation that sorts `keys`."""
+    return np.array(sorted(range(len(keys)), key=keys.__getitem__),
+                    dtype=np.int32)
+
+
+def find(table, order, key):
+    """
+    Returns the index in `table` of string `key`, where `order` is the
+    permutation sorting `table`, or None if it is not there.
+    """
+    i = bisect.bisect_left(order, key, key=lambda i: table[i])
+    if i < len(order) and table[order[i]] == key:
+        return int(order[i])
+    return None
+
+
+def build_csr(rows, columns, n_rows):
+    """
+    Returns (indptr, indices) arrays of a compressed-sparse-row adjacency
+    from parallel arrays of `rows` and `columns`.
+    """
+    order = np.argsort(rows, kind="stable")
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, columns[order].astype(np.int32)
+
+
+def gather(indptr, indices, nodes):
+    """
+    Returns arrays (positions, values) listing the CSR row of every node
+    in `nodes`, where `positions` is the index into `nodes` that each
+    value came from.
+    """
+    starts = indptr[nodes]
+    counts = indptr[nodes + 1] - starts
+    positions = np.repeat(np.arange(len(nodes)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts,
+                                                  counts)
+    return positions, indices[starts[positions] + offsets]
@@ -0,0 +1,70 @@
+import csv
+import os
+import random
+
+import degrees
+
+
+def synthetic_data(edges, stars_per_movie=8, seed=0):
+    """
+    Fill the `degrees` people/movies dicts with a random graph that has
+    `edges` (person, movie) star entries, plus one isolated person so
+    that a search for it has to explore the whole graph.
+
+    Return (source, unreachable_target).
+    """
+    rng = random.Random(seed)
+    n_movies = max(1, edges // stars_per_movie)
+    n_people = max(2, edges // 4)
+
+    reset_data()
+    for i in range(n_people + 1):
+        degrees.people[str(i)] = {"name": f"Person {i}", "birth": "",
+                                  "movies": set()}
+    for m in range(n_movies):
+        degrees.movies[str(m)] = {"title": f"Movie {m}", "year": "",
+                                  "stars": set()}
+
+    for k in range(edges):
+        person = str(rng.randrange(n_people))
+        movie = str(k % n_movies)
+        degrees.people[person]["movies"].add(movie)
+        degrees.movies[movie]["stars"].add(person)
+
+    return "0", str(n_people)
+
+
+def write_synthetic_csv(directory, edges, stars_per_movie=8, seed=0):
+    """
+    Write people.csv, movies.csv and stars.csv for the same kind of random
+    graph as `synthetic_data` into `directory`.
+    """
+    synthetic_data(edges, stars_per_movie, seed)
+    with open(os.path.join(directory, "people.csv"), "w", newline="",
+              encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for person_id, person in degrees.people.items():
+            writer.writerow([person_id, person["name"], person["birth"]])
+    with open(os.path.join(directory, "movies.csv"), "w", newline="",
+              encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "title", "year"])
+        for movie_id, movie in degrees.movies.items():
+            writer.writerow([movie_id, movie["title"], movie["year"]])
+    with open(os.path.join(directory, "stars.csv"), "w", newline="",
+              encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        for person_id, person in degrees.people.items():
+            for movie_id in person["movies"]:
+                writer.writerow([person_id, movie_id])
+    reset_data()
+
+
+def reset_data():
+    """Empty the `degrees` dicts and unload any CSR graph."""
+    degrees.names.clear()
+    degrees.people.clear()
+    degrees.movies.clear()
+    degrees.graph = None
@@ -0,0 +1,79 @@
+import os
+import random
+import tempfile
+import unittest
+
+import degrees
+from graph import CSRGraph
+from synthetic import reset_data, write_synthetic_csv
+
+SMALL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "small")
+
+
+class SearchTestCase(unittest.TestCase):
+    """
+    Check that breadth-first and bidirectional searches, on the dicts
+    and on the CSR graph, find valid paths of the same length between
+    every pair of people asked about.
+    """
+
+    def tearDown(self):
+        reset_data()
+
+    def assertValidPath(self, source, target, path):
+        person = source
+        for movie, next_person in path:
+            self.assertIn(movie, degrees.people[person]["movies"])
+            self.assertIn(movie, degrees.people[next_person]["movies"])
+            person = next_person
+        self.assertEqual(person, target)
+
+    def check_searches(self, directory, pairs):
+        reset_data()
+        degrees.load_data(directory)
+        csr = CSRGraph.open(directory, cache=False)
+        for source, target in pairs:
+            paths = [
+                degrees.shortest_path(source, target),
+                degrees.shortest_path(source, target, bidirectional=True),
+                csr.shortest_path(source, target),
+                csr.bidirectional_shortest_path(source, target),
+            ]
+            lengths = [None if path is None else len(path) for path in paths]
+            self.assertEqual(len(set(lengths)), 1, (source, target, lengths))
+            for path in paths:
+                if path is not None:
+                    self.assertValidPath(source, target, path)
+
+    def test_small(self):
+        reset_data()
+        degrees.load_data(SMALL)
+        people = list(degrees.people)
+        self.check_searches(SMALL, [(source, target) for source in people
+                                    for target in people])
+
+    def test_synthetic(self):
+        rng = random.Random(0)
+        with tempfile.TemporaryDirectory() as directory:
+            write_synthetic_csv(directory, 2_000, stars_per_movie=3)
+            degrees.load_data(directory)
+            people = list(degrees.people)
+            pairs = [(rng.choice(people), rng.choice(people))
+                     for _ in range(200)]
+
+            # The last person stars in nothing, so is unreachable
+            pairs.append((people[0], people[-1]))
+            self.check_searches(directory, pairs)
+
+    def test_known_path(self):
+        reset_data()
+        degrees.load_data(SMALL)
+        for bidirectional in (False, True):
+            path = degrees.shortest_path("102", "158",
+                                         bidirectional=bidirectional)
+            self.assertEqual(len(path), 1)
+            self.assertEqual(path[0][1], "158")
+
+
+if __name__ == "__main__":
+    unittest.main()
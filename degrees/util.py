@@ -1,3 +1,14 @@
+import bisect
+import heapq
+from collections import deque
+
+import numpy as np
+
+# Most names a fuzzy lookup compares with the name looked up, at each
+# distance
+FUZZY_CANDIDATES = 32
+
+
 class Node():
     def __init__(self, state, parent, action):
         self.state = state
@@ -36,3 +47,344 @@ class QueueFrontier(StackFrontier):
             node = self.frontier[0]
             self.frontier = self.frontier[1:]
             return node
+
+
+class HashedStackFrontier(StackFrontier):
+    """
+    Stack frontier backed by a deque, with a count of the states it holds
+    so that `contains_state` is a hash lookup instead of a linear scan.
+    """
+
+    def __init__(self):
+        self.frontier = deque()
+        self.states = {}
+
+    def add(self, node):
+        self.frontier.append(node)
+        self.states[node.state] = self.states.get(node.state, 0) + 1
+
+    def contains_state(self, state):
+        return state in self.states
+
+    def pop(self):
+        return self.frontier.pop()
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        else:
+            node = self.pop()
+            count = self.states[node.state] - 1
+            if count:
+                self.states[node.state] = count
+            else:
+                del self.states[node.state]
+            return node
+
+
+class HashedQueueFrontier(HashedStackFrontier):
+
+    def pop(self):
+        return self.frontier.popleft()
+
+
+class NameIndex():
+    """
+    Index of people's names supporting exact, prefix and fuzzy
+    (edit distance) lookups, with matches ranked by popularity.
+
+    `names`, `person_ids` and `popularity` are parallel sequences; `order`
+    is the permutation sorting `names` case-insensitively, computed here
+    if not given. `trigrams` is the index used by fuzzy lookups, as
+    returned by `trigram_index`; it is built by `build_trigrams` if not
+    given.
+    """
+
+    def __init__(self, names, person_ids, popularity, order=None,
+                 trigrams=None):
+        self.names = names
+        self.person_ids = person_ids
+        self.popularity = popularity
+        if order is None:
+            order = sorted(range(len(names)), key=lambda i: names[i].lower())
+        self.order = order
+        self.positions = range(len(order))
+        self.trigrams = trigrams
+
+    def key(self, position):
+        """Returns the lowercase name at `position` in sorted order."""
+        return self.names[self.order[position]].lower()
+
+    def span(self, low, high):
+        """Returns the sorted positions of names from `low` up to `high`."""
+        start = bisect.bisect_left(self.positions, low, key=self.key)
+        end = bisect.bisect_left(self.positions, high, lo=start, key=self.key)
+        return range(start, end)
+
+    def rank(self, positions, limit=None):
+        """
+        Returns the person_ids at sorted `positions`, most popular first.
+        """
+        people = [self.order[position] for position in positions]
+        if limit is None:
+            people.sort(key=lambda i: -self.popularity[i])
+        else:
+            people = heapq.nlargest(limit, people,
+                                    key=lambda i: self.popularity[i])
+        return [self.person_ids[i] for i in people]
+
+    def exact(self, name):
+        """Returns the person_ids with exactly this name, ignoring case."""
+        name = name.lower()
+        return self.rank(self.span(name, name + "\0"))
+
+    def prefix(self, prefix, limit=10):
+        """Returns up to `limit` person_ids whose name starts with `prefix`."""
+        prefix = prefix.lower()
+        return self.rank(self.span(prefix, prefix + "\U0010ffff"), limit)
+
+    def fuzzy(self, name, limit=10, max_distance=2,
+              budget=FUZZY_CANDIDATES):
+        """
+        Returns up to `limit` person_ids whose name is within `max_distance`
+        edits of `name`, closest and then most popular first.
+
+        Names one edit away are looked for first, and names farther away
+        only if there are none. At each distance only the `budget`
+        candidates sharing the most trigrams with `name` are compared
+        with it, so a lookup stays quick when many names are alike.
+        """
+        if self.trigrams is None:
+            self.build_trigrams()
+
+        name = name.lower()
+        lists = self.postings(trigrams(name))
+        max_distance = min(max_distance, (len(lists) - 1) // 3)
+        if max_distance <= 0:
+            return self.exact(name)[:limit]
+
+        for distance in range(1, max_distance + 1):
+            matches = []
+            for position in self.candidates(name, lists, distance,
+                                            budget).tolist():
+                key = self.key(position)
+                edits = edit_distance(name, key, distance)
+                if edits <= distance:
+                    for person_id in self.exact(key):
+                        matches.append((edits, person_id))
+            if matches:
+                break
+
+        # exact() already ranks by popularity, and sorting is stable
+        matches.sort(key=lambda match: match[0])
+        return [person_id for _, person_id in matches[:limit]]
+
+    def postings(self, grams):
+        """
+        Returns, for each trigram in `grams`, the postings of the distinct
+        names containing it, as `trigram_index` sorts them.
+        """
+        gram_keys, gram_indptr, gram_postings = self.trigrams[:3]
+        keys = np.array([gram_key(gram) for gram in grams], dtype=np.int64)
+        found = np.searchsorted(gram_keys, keys)
+        found[found == len(gram_keys)] = 0
+        present = (gram_keys[found] == keys if len(gram_keys)
+                   else np.zeros(len(keys), dtype=bool))
+        starts = np.where(present, gram_indptr[found], 0)
+        ends = np.where(present, gram_indptr[found + 1], 0)
+        return [gram_postings[start:end]
+                for start, end in zip(starts.tolist(), ends.tolist())]
+
+    def candidates(self, name, lists, distance, budget):
+        """
+        Returns the sorted positions of up to `budget` names that may be
+        within `distance` edits of `name`, those sharing the most trigrams
+        with it, given the postings of each trigram of `name`.
+
+        An edit changes at most three trigrams, so two names within d
+        edits share all but 3d of the distinct trigrams of either one.
+        Only names within d of the length of `name` are looked at, which
+        is a slice of every list. Candidates are the names in the 3d + 1
+        shortest slices, kept only if enough of the longer slices contain
+        them too, before any edit distance is computed.
+        """
+        gram_postings, gram_counts = self.trigrams[2:]
+        n = len(gram_counts)
+        bounds = np.array([len(name) - distance, len(name) + distance + 1])
+        bounds = np.minimum(bounds * n, np.iinfo(gram_postings.dtype).max)
+        bounds = bounds.astype(gram_postings.dtype)
+        slices = []
+        for postings in lists:
+            start, end = postings.searchsorted(bounds).tolist()
+            slices.append(postings[start:end])
+        slices.sort(key=len)
+
+        short = 3 * distance + 1
+        candidates = np.sort(np.concatenate(slices[:short]))
+        first = np.ones(len(candidates), dtype=bool)
+        np.not_equal(candidates[1:], candidates[:-1], out=first[1:])
+        starts = np.flatnonzero(first)
+        shared = np.diff(np.append(starts, len(candidates)))
+        candidates = candidates[starts]
+
+        # Every candidate must share this many trigrams, and one with more
+        # trigrams than `name` more still, which is checked at the end
+        needed = len(lists) - 3 * distance
+        for i, postings in enumerate(slices[short:], short):
+            if not len(candidates):
+                break
+            if not len(postings):
+                continue
+
+            # Drop candidates that can no longer share enough trigrams
+            viable = shared + (len(lists) - i) >= needed
+            if not viable.all():
+                candidates, shared = candidates[viable], shared[viable]
+            found = np.searchsorted(postings, candidates)
+            np.minimum(found, len(postings) - 1, out=found)
+            shared += postings[found] == candidates
+        positions = candidates % n
+        enough = shared >= np.maximum(gram_counts[positions],
+                                      len(lists)) - 3 * distance
+        positions, shared = positions[enough], shared[enough]
+        if len(positions) > budget:
+            positions = positions[np.argpartition(-shared, budget)[:budget]]
+        return np.sort(positions)
+
+    def search(self, name, limit=10):
+        """
+        Returns up to `limit` person_ids for `name`: exact matches, then
+        names starting with it, then names within a few edits of it,
+        looking no further once `limit` are found.
+        """
+        results = self.exact(name)[:limit]
+        for lookup in (self.prefix, self.fuzzy):
+            if len(results) >= limit:
+                break
+            for person_id in lookup(name, limit):
+                if person_id not in results:
+                    results.append(person_id)
+        return results[:limit]
+
+    def build_trigrams(self):
+        """Builds the trigram index of the names, for fuzzy lookups."""
+        self.trigrams = trigram_index(
+            [self.names[i].lower() for i in self.order]
+        )
+
+
+def trigrams(name):
+    """Returns the set of trigrams of `name`, padded at both ends."""
+    padded = f"  {name}  "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def gram_key(gram):
+    """Returns a trigram as one integer, 21 bits per code point."""
+    return ord(gram[0]) << 42 | ord(gram[1]) << 21 | ord(gram[2])
+
+
+def trigram_index(keys):
+    """
+    Returns the trigram index of sorted lowercase names `keys` as arrays
+    (gram_keys, gram_indptr, gram_postings, gram_counts): every trigram
+    as a sorted `gram_key`, and in compressed-sparse-row form the
+    distinct names containing it, then every name's number of distinct
+    trigrams.
+
+    A name at position p of length l is posted as l * len(keys) + p, so
+    that each trigram's postings sort by length and then position, and
+    the names of a few lengths are one slice of them.
+    """
+    n = len(keys)
+    lengths = np.fromiter(map(len, keys), dtype=np.int64, count=n)
+    first = np.ones(n, dtype=bool)
+    first[1:] = [keys[i] != keys[i - 1] for i in range(1, n)]
+    distinct = np.flatnonzero(first)
+
+    # Every trigram of every distinct name, padded, from its code points
+    codes = np.frombuffer(
+        "".join(f"  {keys[i]}  " for i in distinct.tolist())
+        .encode("utf-32-le"), dtype=np.uint32
+    ).astype(np.int64)
+    sizes = lengths[distinct] + 2
+    ends = np.cumsum(sizes)
+    starts = np.repeat(ends - sizes + 2 * np.arange(len(distinct)), sizes)
+    offsets = starts + np.arange(ends[-1] if n else 0) - np.repeat(
+        ends - sizes, sizes
+    )
+
+    # Number the characters in code point order, so that trigrams and
+    # the names containing them sort as one integer
+    chars = np.flatnonzero(np.bincount(codes))
+    rank = np.zeros(chars[-1] + 1 if len(chars) else 0, dtype=np.int64)
+    rank[chars] = np.arange(len(chars))
+    codes = rank[codes]
+    size = max(len(chars), 1)
+    grams = (codes[offsets] * size + codes[offsets + 1]) * size
+    grams += codes[offsets + 2]
+
+    # Sort by trigram and then posting, and drop a trigram repeated
+    # within one name
+    postings = np.repeat(lengths[distinct] * n + distinct, sizes)
+    span = (int(lengths.max()) + 1) * n if n else 1
+    if size ** 3 * span < 2 ** 63:
+        pairs = np.sort(grams * span + postings)
+        pairs = pairs[np.diff(pairs, prepend=-1) != 0]
+        grams, postings = np.divmod(pairs, span)
+    else:
+        order = np.lexsort((postings, grams))
+        grams, postings = grams[order], postings[order]
+        keep = ((np.diff(grams, prepend=-1) != 0)
+                | (np.diff(postings, prepend=-1) != 0))
+        grams, postings = grams[keep], postings[keep]
+    starts = np.flatnonzero(np.diff(grams, prepend=-1) != 0)
+    gram_indptr = np.append(starts, len(grams)).astype(np.int64)
+    grams = grams[starts]
+    gram_keys = (chars[grams // size ** 2] << 42
+                 | chars[grams // size % size] << 21 | chars[grams % size])
+
+    # A repeated name has as many trigrams as its first occurrence
+    counts = np.bincount(postings % max(n, 1), minlength=n)
+    first_of = np.maximum.accumulate(np.where(first, np.arange(n), 0))
+    dtype = np.int32 if span < 2 ** 31 else np.int64
+    return (gram_keys.astype(np.int64), gram_indptr, postings.astype(dtype),
+            counts[first_of].astype(np.int32))
+
+def edit_distance(a, b, bound):
+    """
+    Returns the Levenshtein distance between `a` and `b`, or any number
+    greater than `bound` as soon as it is known to exceed it.
+
+    The column of distances from every prefix of `a` is kept as bits of
+    its steps up and down, so each character of `b` costs a few integer
+    operations however long `a` is (Myers, 1999, in Hyyro's form).
+    """
+    if abs(len(a) - len(b)) > bound:
+        return bound + 1
+    if not a:
+        return len(b)
+    matches = {}
+    for i, char in enumerate(a):
+        matches[char] = matches.get(char, 0) | 1 << i
+    full = (1 << len(a)) - 1
+    last = 1 << (len(a) - 1)
+    up, down = full, 0
+    distance = len(a)
+    for j, char in enumerate(b, 1):
+        match = matches.get(char, 0)
+        vertical = match | down
+        horizontal = (((match & up) + up) ^ up) | match
+        right_up = down | ~(horizontal | up)
+        right_down = up & horizontal
+        if right_up & last:
+            distance += 1
+        elif right_down & last:
+            distance -= 1
+        if distance - (len(b) - j) > bound:
+            return bound + 1
+        right_up = (right_up << 1 | 1) & full
+        right_down = right_down << 1 & full
+        up = right_down | ~(vertical | right_up) & full
+        down = right_up & vertical
+    return distance
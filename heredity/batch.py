@@ -0,0 +1,98 @@
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import heredity
+
+# Set in each worker by `init_worker`: the directory of family CSVs and
+# the keyword arguments of `heredity.infer`
+directory = None
+options = None
+
+
+def list_families(path):
+    """Return the sorted names of the CSV files in directory `path`."""
+    return sorted(filename for filename in os.listdir(path)
+                  if filename.endswith(".csv"))
+
+
+def init_worker(path, method, order, samples, seed):
+    """Share the directory and inference options with a worker process."""
+    global directory, options
+    directory = path
+    options = {"method": method, "order": order, "samples": samples,
+               "seed": seed}
+
+
+def infer_family(task):
+    """
+    Return the JSON-serialisable result of inference on one (index,
+    filename) family: its marginals, with their standard errors and
+    effective sample sizes for the sampling methods, or an error.
+    Sampling methods given a seed use `seed + index` for each family.
+    """
+    index, filename = task
+    result = {"family": filename}
+    seed = options["seed"]
+    start = time.perf_counter()
+    try:
+        people = heredity.load_data(os.path.join(directory, filename))
+        probabilities, errors, sizes = heredity.infer(
+            people, options["method"], options["order"], options["samples"],
+            None if seed is None else seed + index
+        )
+    except (OSError, KeyError, ValueError) as e:
+        result["error"] = str(e)
+        return result
+
+    result["people"] = len(people)
+    result["seconds"] = time.perf_counter() - start
+    result["probabilities"] = probabilities
+    if errors is not None:
+        result["standard_errors"] = errors
+        result["effective_sizes"] = sizes
+    return result
+
+
+def run_batch(path, outfile, workers=None, method="elimination",
+              order="min-fill", samples=100_000, seed=None):
+    """
+    Run inference with `method` on every family CSV in directory `path`
+    on a pool of `workers` processes (or in this one, if `workers` is 1),
+    writing one JSON result per line to `outfile` in filename order, and
+    report families and people per second on stderr.
+    """
+    workers = workers or os.cpu_count()
+    tasks = list(enumerate(list_families(path)))
+    initargs = (path, method, order, samples, seed)
+    start = time.perf_counter()
+    if workers == 1:
+        init_worker(*initargs)
+        people = write_results(map(infer_family, tasks), outfile)
+    else:
+        with ProcessPoolExecutor(workers, initializer=init_worker,
+                                 initargs=initargs) as pool:
+            chunksize = max(1, len(tasks) // (4 * workers))
+            people = write_results(
+                pool.map(infer_family, tasks, chunksize=chunksize), outfile
+            )
+    report(len(tasks), people, time.perf_counter() - start)
+
+
+def write_results(results, outfile):
+    """Write each result as a JSON line; return how many people they had."""
+    people = 0
+    for result in results:
+        people += result.get("people", 0)
+        outfile.write(json.dumps(result) + "\n")
+    return people
+
+
+def report(families, people, seconds):
+    rate = families / seconds if seconds else 0
+    people_rate = people / seconds if seconds else 0
+    print(f"{families} families ({people} people) in {seconds:.3f}s "
+          f"({rate:.1f} families/s, {people_rate:.1f} people/s)",
+          file=sys.stderr)
@@ -0,0 +1,213 @@
+import argparse
+import math
+import time
+import warnings
+
+import numpy as np
+
+import heredity
+import inference
+import sampling
+from generator import random_pedigree
+
+
+def bench_joint(args):
+    """
+    Time `heredity.joint_probability` against `log_joint_probability` on
+    random assignments, and enumeration one assignment at a time against
+    batched enumeration, checking that they agree.
+    """
+    rng = np.random.default_rng(0)
+    for size in args.people:
+        people = random_pedigree(size, args.observed, seed=size)
+        names = list(people)
+        genes = rng.integers(0, 3, (args.assignments, size))
+        traits = rng.random((args.assignments, size)) < 0.5
+        print(f"{size} people, {args.assignments} assignments")
+
+        start = time.perf_counter()
+        expected = []
+        for row_genes, row_traits in zip(genes.tolist(), traits.tolist()):
+            expected.append(heredity.joint_probability(
+                people,
+                {name for name, g in zip(names, row_genes) if g == 1},
+                {name for name, g in zip(names, row_genes) if g == 2},
+                {name for name, t in zip(names, row_traits) if t},
+            ))
+        print(f"  joint_probability      {time.perf_counter() - start:.4f}s")
+
+        start = time.perf_counter()
+        log_p = inference.log_joint_probability(people, names, genes, traits)
+        print(f"  log_joint_probability  {time.perf_counter() - start:.4f}s")
+        error = max(abs(math.exp(q) - p) / p
+                    for q, p in zip(log_p.tolist(), expected))
+        assert error < 1e-12, f"relative error {error}"
+
+        if size <= args.max_enumerate:
+            start = time.perf_counter()
+            expected = heredity.enumerate_probabilities(people)
+            print(f"  enumerate              "
+                  f"{time.perf_counter() - start:.4f}s")
+            start = time.perf_counter()
+            probabilities = inference.batched_probabilities(people)
+            print(f"  batched enumerate      "
+                  f"{time.perf_counter() - start:.4f}s")
+            assert max_difference(probabilities, expected) < 1e-12
+
+
+def bench_enumeration(args):
+    """
+    Time every way of enumerating assignments on random family trees,
+    checking that they agree with variable elimination.
+    """
+    methods = {
+        "enumerate": heredity.enumerate_probabilities,
+        "batched": inference.batched_probabilities,
+        "incremental": inference.incremental_probabilities,
+    }
+    for size in args.people:
+        people = random_pedigree(size, args.observed, seed=size)
+        unknown = sum(person["trait"] is None for person in people.values())
+        print(f"{size} people, {3 ** size * 2 ** unknown} assignments")
+        expected = inference.marginals(people)
+        for method, function in methods.items():
+            if method == "enumerate" and size > args.max_enumerate:
+                continue
+            start = time.perf_counter()
+            probabilities = function(people)
+            print(f"  {method:12}{time.perf_counter() - start:.4f}s")
+            error = max_difference(probabilities, expected)
+            assert error < 1e-12, f"{method} differs by {error}"
+
+
+def max_difference(probabilities, expected):
+    """Return the largest difference between two sets of distributions."""
+    return max(
+        abs(probabilities[person][field][value]
+            - expected[person][field][value])
+        for person in expected
+        for field in expected[person]
+        for value in expected[person][field]
+    )
+
+
+def bench_elimination(args):
+    """
+    Time variable elimination with each ordering heuristic on random
+    family trees, checking it against enumeration on small ones.
+    """
+    for size in args.people:
+        people = random_pedigree(size, args.observed, seed=size)
+        print(f"{len(people)} people")
+        results = {}
+        if size <= args.max_enumerate:
+            start = time.perf_counter()
+            results["enumerate"] = heredity.enumerate_probabilities(people)
+            print(f"  enumerate   {time.perf_counter() - start:.4f}s")
+        for heuristic in ("min-fill", "min-degree"):
+            start = time.perf_counter()
+            results[heuristic] = inference.marginals(people, heuristic)
+            print(f"  {heuristic:12}{time.perf_counter() - start:.4f}s")
+
+        expected = results.popitem()[1]
+        for method, probabilities in results.items():
+            error = max_difference(probabilities, expected)
+            assert error < 1e-9, f"{method} differs by {error}"
+
+
+def bench_sampling(args):
+    """
+    Time likelihood weighting and Gibbs sampling on random family trees,
+    comparing their estimates and standard errors with the exact
+    marginals of variable elimination, and show any warning that the
+    Gibbs chains have not mixed.
+    """
+    methods = {
+        "likelihood-weighting": sampling.likelihood_weighting,
+        "gibbs": sampling.gibbs,
+    }
+    for size in args.people:
+        people = random_pedigree(size, args.observed, seed=size)
+        expected = inference.marginals(people)
+        print(f"{size} people, {args.samples} samples")
+        print(f"  {'method':22}{'time':>9}{'max error':>11}"
+              f"{'max se':>9}{'max z':>8}{'min ess':>10}")
+        for method, function in methods.items():
+            start = time.perf_counter()
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter("always")
+                probabilities, errors, sizes = function(people, args.samples,
+                                                        seed=args.seed)
+            elapsed = time.perf_counter() - start
+            z = max(
+                (abs(probabilities[person][field][value]
+                     - expected[person][field][value])
+                 / errors[person][field][value])
+                for person in expected
+                for field in expected[person]
+                for value in expected[person][field]
+                if errors[person][field][value] > 0
+            )
+            print(f"  {method:22}{elapsed:8.3f}s"
+                  f"{max_difference(probabilities, expected):11.4f}"
+                  f"{max(values(errors)):9.4f}{z:8.2f}"
+                  f"{min(values(sizes)):10.0f}")
+            for warning in caught:
+                print(f"    {warning.message}")
+
+
+def values(distributions):
+    """Return a list of every value in a set of distributions."""
+    return [value
+            for fields in distributions.values()
+            for distribution in fields.values()
+            for value in distribution.values()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark heredity.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    elimination = commands.add_parser(
+        "elimination", help="variable elimination on random family trees"
+    )
+    elimination.add_argument("--people", type=int, nargs="+",
+                             default=[5, 6, 50, 200, 500])
+    elimination.add_argument("--observed", type=float, default=0.5)
+    elimination.add_argument("--max-enumerate", type=int, default=6)
+    elimination.set_defaults(run=bench_elimination)
+
+    joint = commands.add_parser(
+        "joint", help="scalar against batched joint probabilities"
+    )
+    joint.add_argument("--people", type=int, nargs="+", default=[5, 6, 100])
+    joint.add_argument("--observed", type=float, default=0.5)
+    joint.add_argument("--assignments", type=int, default=10_000)
+    joint.add_argument("--max-enumerate", type=int, default=6)
+    joint.set_defaults(run=bench_joint)
+
+    enumeration = commands.add_parser(
+        "enumeration", help="scalar, batched and incremental enumeration"
+    )
+    enumeration.add_argument("--people", type=int, nargs="+",
+                             default=[4, 6, 8, 10])
+    enumeration.add_argument("--observed", type=float, default=0.5)
+    enumeration.add_argument("--max-enumerate", type=int, default=6)
+    enumeration.set_defaults(run=bench_enumeration)
+
+    sampler = commands.add_parser(
+        "sampling", help="likelihood weighting and Gibbs sampling"
+    )
+    sampler.add_argument("--people", type=int, nargs="+",
+                         default=[6, 20, 100])
+    sampler.add_argument("--observed", type=float, default=0.5)
+    sampler.add_argument("--samples", type=int, default=100_000)
+    sampler.add_argument("--seed", type=int, default=0)
+    sampler.set_defaults(run=bench_sampling)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
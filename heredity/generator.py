@@ -0,0 +1,112 @@
+import argparse
+import csv
+import os
+import random
+
+from heredity import PROBS
+
+
+def random_pedigree(size, observed=0.5, seed=0):
+    """
+    Return `size` people, as `heredity.load_data` would, in a random
+    family tree: founding couples have children, who each go on to have
+    children with a new founder from outside the family or, now and
+    then, with someone else of their generation.
+
+    Everyone's genes and trait are drawn from PROBS, founders' genes
+    from the prior and children's from their parents', and a fraction
+    `observed` of people have their trait known.
+    """
+    rng = random.Random(seed)
+    people = {}
+    genes = {}
+
+    def add(mother=None, father=None):
+        name = f"P{len(people)}"
+        if mother is None:
+            copies = draw(rng, PROBS["gene"])
+        else:
+            copies = passes(rng, genes[mother]) + passes(rng, genes[father])
+        genes[name] = copies
+        trait = None
+        if rng.random() < observed:
+            trait = draw(rng, PROBS["trait"][copies])
+        people[name] = {"name": name, "mother": mother, "father": father,
+                        "trait": trait}
+        return name
+
+    couples = [(add(), add())]
+    while len(people) < size:
+        single = []
+        next_couples = []
+        for mother, father in couples:
+            for _ in range(rng.randint(1, 3)):
+                if len(people) >= size:
+                    break
+                child = add(mother, father)
+                if single and rng.random() < 0.1:
+                    spouse = single.pop()
+                elif len(people) < size:
+                    spouse = add()
+                else:
+                    continue
+                next_couples.append((child, spouse) if rng.random() < 0.5
+                                    else (spouse, child))
+                single.append(child)
+        couples = next_couples or [(add(), add())]
+    return people
+
+
+def draw(rng, distribution):
+    """Return a value drawn from dictionary `distribution` of probabilities."""
+    values = list(distribution)
+    return rng.choices(values, [distribution[value] for value in values])[0]
+
+
+def passes(rng, copies):
+    """Return 1 if a parent with `copies` copies passes the gene on, else 0."""
+    p = {0: 0, 1: 0.5, 2: 1}[copies]
+    passed = rng.random() < p
+    if rng.random() < PROBS["mutation"]:
+        passed = not passed
+    return int(passed)
+
+
+def write_data(people, filename):
+    """Write `people` to `filename` in the format of `heredity.load_data`."""
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "mother", "father", "trait"])
+        for person in people.values():
+            trait = person["trait"]
+            writer.writerow([person["name"], person["mother"] or "",
+                             person["father"] or "",
+                             "" if trait is None else int(trait)])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Write random family trees as heredity CSV files."
+    )
+    parser.add_argument("directory")
+    parser.add_argument("--families", type=int, default=100)
+    parser.add_argument("--people", type=int, nargs=2, default=[10, 50],
+                        metavar=("MIN", "MAX"),
+                        help="range of people in each family")
+    parser.add_argument("--observed", type=float, default=0.5,
+                        help="fraction of people with a known trait")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    os.makedirs(args.directory, exist_ok=True)
+    width = len(str(args.families - 1))
+    for i in range(args.families):
+        people = random_pedigree(rng.randint(*args.people), args.observed,
+                                 seed=rng.randrange(2 ** 32))
+        write_data(people, os.path.join(args.directory,
+                                        f"family{i:0{width}}.csv"))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import argparse
 import csv
 import itertools
 import sys
@@ -41,9 +42,99 @@ PROBS = {
 def main():
 
     # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
-    people = load_data(sys.argv[1])
+    parser = argparse.ArgumentParser(
+        usage="python heredity.py data.csv "
+              "[--method {enumerate,batched,incremental,elimination,"
+              "likelihood-weighting,gibbs}] "
+              "[--order {min-fill,min-degree}] [--samples N] [--seed SEED] "
+              "[--batch [--workers N]]"
+    )
+    parser.add_argument("data")
+    parser.add_argument("--method",
+                        choices=["enumerate", "batched", "incremental",
+                                 "elimination", "likelihood-weighting",
+                                 "gibbs"],
+                        help="sum over every assignment of genes and traits "
+                             "(one at a time, in NumPy batches or updating "
+                             "one person at a time), run variable "
+                             "elimination, or estimate by sampling "
+                             "(default: enumerate, or elimination with "
+                             "--batch)")
+    parser.add_argument("--order", choices=["min-fill", "min-degree"],
+                        default="min-fill",
+                        help="elimination order heuristic")
+    parser.add_argument("--samples", type=int, default=100_000,
+                        help="sample budget of the sampling methods")
+    parser.add_argument("--seed", type=int, help="seed of the sampling methods")
+    parser.add_argument("--batch", action="store_true",
+                        help="treat data as a directory of family CSVs and "
+                             "write each one's marginals as a JSON line")
+    parser.add_argument("--workers", type=int, help="processes for --batch")
+    args = parser.parse_args()
+
+    if args.batch:
+        import batch
+        batch.run_batch(args.data, sys.stdout, args.workers,
+                        args.method or "elimination", args.order,
+                        args.samples, args.seed)
+        return
+
+    people = load_data(args.data)
+    probabilities, errors, sizes = infer(people, args.method or "enumerate",
+                                         args.order,
+                                         args.samples, args.seed)
+
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                if errors is None:
+                    print(f"    {value}: {p:.4f}")
+                else:
+                    print(f"    {value}: {p:.4f} "
+                          f"± {errors[person][field][value]:.4f} "
+                          f"(ESS {sizes[person][field][value]:.0f})")
+
+
+def infer(people, method="enumerate", order="min-fill", samples=100_000,
+          seed=None):
+    """
+    Compute every person's gene and trait distribution given the known
+    traits with `method`, one of the choices of `--method`.
+
+    Return (probabilities, standard_errors, effective_sizes). The
+    sampling methods estimate the last two for each probability; the
+    exact methods return None for both.
+    """
+    if method == "enumerate":
+        return enumerate_probabilities(people), None, None
+    if method == "batched":
+        import inference
+        return inference.batched_probabilities(people), None, None
+    if method == "incremental":
+        import inference
+        return inference.incremental_probabilities(people), None, None
+    if method == "elimination":
+        import inference
+        return inference.marginals(people, order), None, None
+    if method == "likelihood-weighting":
+        import sampling
+        return sampling.likelihood_weighting(people, samples, seed=seed)
+    if method == "gibbs":
+        import sampling
+        return sampling.gibbs(people, samples, seed=seed)
+    raise ValueError(f"unknown method: {method}")
+
+
+def enumerate_probabilities(people):
+    """
+    Compute every person's gene and trait distribution given the known
+    traits, by summing the joint probability of every assignment of
+    genes and traits that agrees with them.
+    """
 
     # Keep track of gene and trait probabilities for each person
     probabilities = {
@@ -84,15 +175,7 @@ def main():
 
     # Ensure probabilities sum to 1
     normalize(probabilities)
-
-    # Print results
-    for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+    return probabilities
 
 
 def load_data(filename):
@@ -0,0 +1,434 @@
+import numpy as np
+
+from heredity import PROBS
+
+
+def gene_prior():
+    """Return the unconditional distribution of gene copies, by copies."""
+    return np.array([PROBS["gene"][genes] for genes in range(3)])
+
+
+def passing():
+    """
+    Return, for each number of copies a parent has, the probability that
+    they pass a copy of the gene on, after mutation.
+    """
+    mutation = PROBS["mutation"]
+    return np.array([mutation, 0.5, 1 - mutation])
+
+
+def inheritance():
+    """
+    Return the array of P(child's copies | mother's copies, father's
+    copies), indexed [child, mother, father].
+    """
+    mother = passing()[:, None]
+    father = passing()[None, :]
+    return np.array([
+        (1 - mother) * (1 - father),
+        mother * (1 - father) + (1 - mother) * father,
+        mother * father,
+    ])
+
+
+def trait_likelihood(trait):
+    """
+    Return P(trait | copies) by copies, for an observed `trait`, or None
+    when the trait is unknown (and so tells nothing about the genes).
+    """
+    if trait is None:
+        return None
+    return np.array([PROBS["trait"][genes][trait] for genes in range(3)])
+
+
+def parent_indexes(people, names):
+    """
+    Return arrays of the index in `names` of each person's mother and
+    father, -1 for people whose parents are unknown.
+    """
+    index = {name: i for i, name in enumerate(names)}
+    mothers = [index.get(people[name]["mother"], -1) for name in names]
+    fathers = [index.get(people[name]["father"], -1) for name in names]
+    return np.array(mothers), np.array(fathers)
+
+
+def log_joint_probability(people, names, genes, traits):
+    """
+    Return the log of `heredity.joint_probability` for a batch of
+    assignments at once: `genes` is an int array of shape (batch, people)
+    holding each person's copies of the gene (people in the order of
+    list `names`) and `traits` a bool array of the same shape.
+    """
+    genes = np.asarray(genes)
+    traits = np.asarray(traits, dtype=bool)
+    mothers, fathers = parent_indexes(people, names)
+    founders = mothers < 0
+    children = ~founders
+
+    log_p = np.zeros(genes.shape)
+    log_p[:, founders] = np.log(gene_prior())[genes[:, founders]]
+    log_p[:, children] = np.log(inheritance())[
+        genes[:, children],
+        genes[:, mothers[children]],
+        genes[:, fathers[children]],
+    ]
+    trait = np.array([[PROBS["trait"][copies][False],
+                       PROBS["trait"][copies][True]] for copies in range(3)])
+    log_p += np.log(trait)[genes, traits.astype(int)]
+    return log_p.sum(axis=1)
+
+
+def batched_probabilities(people, batch=1 << 16):
+    """
+    Compute every person's gene and trait distribution like
+    `heredity.enumerate_probabilities`, evaluating the joint probability
+    of `batch` assignments at a time with `log_joint_probability`.
+
+    Assignment k is decoded from the digits of k: a base 3 digit for
+    each person's genes, then a base 2 digit for each unknown trait.
+    Probabilities are accumulated per person and value with np.add.at,
+    scaled by the largest log probability seen so far.
+
+    Return a dictionary of the same form as `probabilities` in `main`.
+    """
+    names = list(people)
+    n = len(names)
+    unknown = [i for i, name in enumerate(names)
+               if people[name]["trait"] is None]
+    known = np.array([bool(people[name]["trait"]) for name in names])
+    total = 3 ** n * 2 ** len(unknown)
+
+    gene_totals = np.zeros((n, 3))
+    trait_totals = np.zeros((n, 2))
+    people_index = np.arange(n)
+    shift = -np.inf
+    for start in range(0, total, batch):
+        k = np.arange(start, min(start + batch, total), dtype=np.int64)
+        genes = (k[:, None] // 3 ** np.arange(n)) % 3
+        traits = np.broadcast_to(known, (len(k), n)).copy()
+        traits[:, unknown] = (k[:, None] // 3 ** n
+                              // 2 ** np.arange(len(unknown))) % 2
+        log_p = log_joint_probability(people, names, genes, traits)
+
+        if log_p.max() > shift:
+            scale = np.exp(shift - log_p.max())
+            gene_totals *= scale
+            trait_totals *= scale
+            shift = log_p.max()
+        p = np.exp(log_p - shift)
+        rows = np.broadcast_to(people_index, genes.shape)
+        weights = np.broadcast_to(p[:, None], genes.shape)
+        np.add.at(gene_totals, (rows, genes), weights)
+        np.add.at(trait_totals, (rows, traits.astype(int)), weights)
+
+    gene_totals /= gene_totals.sum(axis=1, keepdims=True)
+    trait_totals /= trait_totals.sum(axis=1, keepdims=True)
+    return {
+        name: {
+            "gene": {copies: float(gene_totals[i][copies])
+                     for copies in (2, 1, 0)},
+            "trait": {True: float(trait_totals[i][1]),
+                      False: float(trait_totals[i][0])},
+        }
+        for i, name in enumerate(names)
+    }
+
+
+def gray_code(radices):
+    """
+    Yield the positions of the digits that change, one per step, as a
+    reflected mixed-radix Gray code runs through every combination of
+    digits (Knuth's Algorithm H). Digit i runs from 0 to radices[i] - 1,
+    and each step moves exactly one digit up or down by one.
+    """
+    n = len(radices)
+    digits = [0] * n
+    focus = list(range(n + 1))
+    direction = [1] * n
+    while True:
+        j = focus[0]
+        focus[0] = 0
+        if j == n:
+            return
+        digits[j] += direction[j]
+        if digits[j] == 0 or digits[j] == radices[j] - 1:
+            direction[j] = -direction[j]
+            focus[j] = focus[j + 1]
+            focus[j + 1] = j + 1
+        yield j, digits[j]
+
+
+def incremental_probabilities(people):
+    """
+    Compute every person's gene and trait distribution like
+    `heredity.enumerate_probabilities`, visiting the assignments in Gray
+    code order so that consecutive assignments differ in one person's
+    genes or trait.
+
+    Each person's factor of the joint probability (their genes given
+    their parents', times their trait given their genes) is memoized on
+    (genes, mother's genes, father's genes, trait). After each step only
+    the changed person's factor, and their children's if their genes
+    changed, is looked up again, and the joint probability is kept as a
+    tree of products with one leaf per person. Distributions are
+    accumulated per person only when that person's value changes, from a
+    running total of joint probability, kept with compensated summation
+    so that the difference between two totals stays accurate.
+
+    Return a dictionary of the same form as `probabilities` in `main`.
+    """
+    names = list(people)
+    n = len(names)
+    mothers, fathers = parent_indexes(people, names)
+    mothers, fathers = mothers.tolist(), fathers.tolist()
+    children = [[] for _ in range(n)]
+    for child in range(n):
+        if mothers[child] >= 0:
+            children[mothers[child]].append(child)
+            children[fathers[child]].append(child)
+
+    prior = gene_prior().tolist()
+    inherit = inheritance().tolist()
+    memo = {}
+
+    def factor(person):
+        g = genes[person]
+        mother, father = mothers[person], fathers[person]
+        key = (g, genes[mother] if mother >= 0 else None,
+               genes[father] if father >= 0 else None, traits[person])
+        if key not in memo:
+            p = prior[g] if key[1] is None else inherit[g][key[1]][key[2]]
+            memo[key] = p * PROBS["trait"][g][traits[person]]
+        return memo[key]
+
+    # Start from no genes and the known traits (False if unknown)
+    genes = [0] * n
+    traits = [bool(people[name]["trait"]) for name in names]
+    unknown = [i for i, name in enumerate(names)
+               if people[name]["trait"] is None]
+
+    size = 1
+    while size < n:
+        size *= 2
+    tree = [1.0] * (2 * size)
+
+    def set_factor(person):
+        i = person + size
+        tree[i] = factor(person)
+        i //= 2
+        while i:
+            tree[i] = tree[2 * i] * tree[2 * i + 1]
+            i //= 2
+
+    for person in range(n):
+        set_factor(person)
+
+    # Digits that change most often belong to people with fewest children
+    by_children = sorted(range(n), key=lambda person: len(children[person]))
+    radices = [3] * n + [2] * len(unknown)
+
+    # The running total is the sum high + low, and each person's value
+    # is credited with the running total minus what it was when the
+    # value was set
+    gene_totals = [[0.0] * 3 for _ in range(n)]
+    trait_totals = [[0.0] * 2 for _ in range(n)]
+    gene_since = [(0.0, 0.0)] * n
+    trait_since = [(0.0, 0.0)] * n
+    high, low = tree[1], 0.0
+
+    def since(start):
+        return (high - start[0]) + (low - start[1])
+
+    for digit, value in gray_code(radices):
+        if digit < n:
+            person = by_children[digit]
+            gene_totals[person][genes[person]] += since(gene_since[person])
+            gene_since[person] = (high, low)
+            genes[person] = value
+            set_factor(person)
+            for child in children[person]:
+                set_factor(child)
+        else:
+            person = unknown[digit - n]
+            trait_totals[person][traits[person]] += since(trait_since[person])
+            trait_since[person] = (high, low)
+            traits[person] = bool(value)
+            set_factor(person)
+        p = tree[1]
+        total = high + p
+        low += (high - total) + p
+        high = total
+
+    probabilities = {}
+    for person, name in enumerate(names):
+        gene_totals[person][genes[person]] += since(gene_since[person])
+        trait_totals[person][traits[person]] += since(trait_since[person])
+        genes_sum = sum(gene_totals[person])
+        traits_sum = sum(trait_totals[person])
+        probabilities[name] = {
+            "gene": {copies: gene_totals[person][copies] / genes_sum
+                     for copies in (2, 1, 0)},
+            "trait": {True: trait_totals[person][True] / traits_sum,
+                      False: trait_totals[person][False] / traits_sum},
+        }
+    return probabilities
+
+
+def factors(people, names):
+    """
+    Return the factors of the gene network of `people` as (scope, table)
+    pairs: each scope is a tuple of indexes into list `names` and each
+    table an array with an axis per variable in the scope. Every person
+    has an inheritance (or prior) factor, and a person whose trait is
+    known a factor for it.
+    """
+    index = {name: i for i, name in enumerate(names)}
+    result = []
+    for name in names:
+        person = people[name]
+        i = index[name]
+        if person["mother"] is None:
+            result.append(((i,), gene_prior()))
+        else:
+            result.append(((i, index[person["mother"]],
+                            index[person["father"]]), inheritance()))
+        likelihood = trait_likelihood(person["trait"])
+        if likelihood is not None:
+            result.append(((i,), likelihood))
+    return result
+
+
+def elimination_order(scopes, n, heuristic="min-fill"):
+    """
+    Return an order in which to eliminate variables 0 to `n` - 1 of
+    factors with the given `scopes`, greedily choosing next the variable
+    that adds the fewest new edges between its neighbours ("min-fill")
+    or that has the fewest neighbours ("min-degree").
+    """
+    if heuristic not in ("min-fill", "min-degree"):
+        raise ValueError(f"unknown elimination heuristic: {heuristic}")
+    neighbors = {variable: set() for variable in range(n)}
+    for scope in scopes:
+        for variable in scope:
+            neighbors[variable].update(scope)
+    for variable in neighbors:
+        neighbors[variable].discard(variable)
+
+    def cost(variable):
+        adjacent = neighbors[variable]
+        if heuristic == "min-degree":
+            return len(adjacent), variable
+        fill = sum(1 for a in adjacent for b in adjacent
+                   if a < b and b not in neighbors[a])
+        return fill, len(adjacent), variable
+
+    order = []
+    while neighbors:
+        variable = min(neighbors, key=cost)
+        adjacent = neighbors.pop(variable)
+        for a in adjacent:
+            neighbors[a].discard(variable)
+            neighbors[a].update(adjacent - {a})
+        order.append(variable)
+    return order
+
+
+def multiply(factors, keep):
+    """
+    Return the product of `factors`, summed over every variable not in
+    tuple `keep`, as a table with an axis per variable of `keep`.
+    """
+    # einsum takes at most 52 distinct subscripts, so number the
+    # variables of this product from 0
+    label = {}
+    for factor_scope, _ in factors:
+        for variable in factor_scope:
+            label.setdefault(variable, len(label))
+
+    scope, product = [], np.ones(())
+    for factor_scope, table in factors:
+        labels = [label[variable] for variable in factor_scope]
+        joined = scope + [v for v in labels if v not in scope]
+        product = np.einsum(product, scope, table, labels, joined)
+        scope = joined
+    return np.einsum(product, scope, [label[variable] for variable in keep])
+
+
+def marginals(people, heuristic="min-fill"):
+    """
+    Compute every person's gene and trait distribution given the known
+    traits, by variable elimination over the gene network.
+
+    Variables are eliminated in the order chosen by `elimination_order`.
+    Eliminating a variable multiplies the factors in its bucket and
+    sends the sum over it to the bucket of the next variable of the
+    result to be eliminated, which makes the buckets a tree. A second
+    pass back down that tree gives each bucket the rest of the evidence,
+    so one elimination yields every person's distribution. Messages are
+    rescaled to sum to 1 as they go, so large families do not underflow.
+
+    Return a dictionary of the same form as `probabilities` in `main`.
+    """
+    names = list(people)
+    n = len(names)
+    network = factors(people, names)
+    order = elimination_order([scope for scope, _ in network], n, heuristic)
+    position = {variable: i for i, variable in enumerate(order)}
+
+    # Give each factor to the bucket of its first variable eliminated
+    buckets = [[] for _ in range(n)]
+    for scope, table in network:
+        first = min(scope, key=position.get)
+        buckets[first].append((scope, table))
+
+    # Upward pass: eliminate variables in order, sending messages on
+    scopes = [None] * n
+    messages = [None] * n
+    parents = [None] * n
+    children = [[] for _ in range(n)]
+    for variable in order:
+        scope = set()
+        for factor_scope, _ in buckets[variable]:
+            scope.update(factor_scope)
+        scope.discard(variable)
+        scope = tuple(sorted(scope, key=position.get))
+        message = multiply(buckets[variable], scope)
+        message = message / message.sum()
+        scopes[variable] = scope
+        messages[variable] = message
+        if scope:
+            parents[variable] = scope[0]
+            children[scope[0]].append(variable)
+            buckets[scope[0]].append((scope, message))
+
+    # Downward pass: in reverse order, each bucket's belief is its
+    # factors times the message from its parent's bucket
+    incoming = [None] * n
+    genes = np.zeros((n, 3))
+    for variable in reversed(order):
+        bucket = list(buckets[variable])
+        if parents[variable] is not None:
+            bucket.append((scopes[variable], incoming[variable]))
+        belief_scope = (variable,) + scopes[variable]
+        belief = multiply(bucket, belief_scope)
+        belief = belief / belief.sum()
+        genes[variable] = belief.sum(axis=tuple(range(1, belief.ndim)))
+
+        # Each child's bucket receives the belief without its own message
+        for child in children[variable]:
+            summed = multiply([(belief_scope, belief)], scopes[child])
+            message = messages[child]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                summed = np.where(message > 0, summed / message, 0)
+            incoming[child] = summed / summed.sum()
+
+    trait = np.array([PROBS["trait"][copies][True] for copies in range(3)])
+    probabilities = {}
+    for i, name in enumerate(names):
+        known = people[name]["trait"]
+        p_trait = float(genes[i] @ trait) if known is None else float(known)
+        probabilities[name] = {
+            "gene": {copies: float(genes[i][copies]) for copies in (2, 1, 0)},
+            "trait": {True: p_trait, False: 1 - p_trait},
+        }
+    return probabilities
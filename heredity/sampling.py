@@ -0,0 +1,290 @@
+import warnings
+
+import numpy as np
+
+from heredity import PROBS
+from inference import gene_prior, inheritance, parent_indexes
+
+# Split-chain R-hat above which Gibbs sampling warns that its chains have
+# not mixed
+R_HAT_LIMIT = 1.01
+
+
+def trait_table():
+    """Return P(trait | copies) as an array indexed [copies, trait]."""
+    return np.array([[PROBS["trait"][copies][False],
+                      PROBS["trait"][copies][True]] for copies in range(3)])
+
+
+def topological_order(mothers, fathers):
+    """Return person indexes ordered so that parents precede children."""
+    order, placed = [], set()
+
+    def place(person):
+        if person in placed:
+            return
+        for parent in (mothers[person], fathers[person]):
+            if parent >= 0:
+                place(parent)
+        placed.add(person)
+        order.append(person)
+
+    for person in range(len(mothers)):
+        place(person)
+    return order
+
+
+def choose(probabilities, rng):
+    """
+    Return one index per row of `probabilities` (each row summing to 1),
+    drawn by comparing a uniform number with the row's running total.
+    """
+    u = rng.random((len(probabilities), 1))
+    index = (u > np.cumsum(probabilities, axis=1)).sum(axis=1)
+    return np.minimum(index, probabilities.shape[1] - 1)
+
+
+def values(genes, known):
+    """
+    Return, for a (samples, people) array of genes, the quantities whose
+    averages estimate each distribution: an indicator of each number of
+    copies, with shape (samples, people, 3), and the probability of the
+    trait given the genes, with shape (samples, people), or the known
+    trait itself.
+    """
+    indicators = genes[:, :, None] == np.arange(3)
+    trait = trait_table()[genes, 1]
+    observed = known >= 0
+    trait[:, observed] = known[observed]
+    return indicators, trait
+
+
+def results(names, gene_stats, trait_stats):
+    """
+    Return (probabilities, standard_errors, effective_sizes): three
+    dictionaries of the same form as `probabilities` in `main`, from
+    (mean, standard error, effective sample size) arrays for each
+    person's genes, shape (people, 3), and trait, shape (people,).
+    """
+    output = []
+    for k in range(3):
+        output.append({
+            name: {
+                "gene": {copies: float(gene_stats[k][i][copies])
+                         for copies in (2, 1, 0)},
+                "trait": {True: float(trait_stats[k][i]),
+                          False: float(1 - trait_stats[k][i] if k == 0
+                                       else trait_stats[k][i])},
+            }
+            for i, name in enumerate(names)
+        })
+    return tuple(output)
+
+
+def likelihood_weighting(people, samples, batch=10_000, seed=None):
+    """
+    Estimate every person's gene and trait distribution given the known
+    traits from `samples` weighted samples.
+
+    Genes are drawn from PROBS in family order, founders from the prior
+    and children given their parents', `batch` samples at a time, and
+    each sample is weighted by the probability of the known traits given
+    its genes. An unknown trait is estimated by the average probability
+    of the trait given the genes, rather than by sampling it.
+
+    Return (probabilities, standard_errors, effective_sizes), each a
+    dictionary of the same form as `probabilities` in `main`. The
+    effective sample size of an estimate is the number of independent
+    samples that would give the same standard error.
+    """
+    rng = np.random.default_rng(seed)
+    names = list(people)
+    n = len(names)
+    mothers, fathers = parent_indexes(people, names)
+    order = topological_order(mothers, fathers)
+    known = np.array([-1 if people[name]["trait"] is None
+                      else int(people[name]["trait"]) for name in names])
+    observed = np.flatnonzero(known >= 0)
+    prior = gene_prior()
+    inherit = inheritance()
+    log_likelihood = np.log(trait_table())
+
+    # Weighted sums, scaled by exp(-shift) (and its square): sum of w,
+    # of w * f and w * f ** 2, of w ** 2, w ** 2 * f and w ** 2 * f ** 2
+    shift = -np.inf
+    sums = None
+    remaining = samples
+    while remaining > 0:
+        size = min(batch, remaining)
+        remaining -= size
+        genes = np.zeros((size, n), dtype=np.int64)
+        for person in order:
+            if mothers[person] < 0:
+                table = np.broadcast_to(prior, (size, 3))
+            else:
+                table = inherit[:, genes[:, mothers[person]],
+                                genes[:, fathers[person]]].T
+            genes[:, person] = choose(table, rng)
+
+        log_w = log_likelihood[genes[:, observed], known[observed]].sum(axis=1)
+        if log_w.max() > shift:
+            if sums is not None:
+                scale = np.exp(shift - log_w.max())
+                sums = [s * scale ** (1 + (i >= 3))
+                        for i, s in enumerate(sums)]
+            shift = log_w.max()
+        w = np.exp(log_w - shift)
+
+        indicators, trait = values(genes, known)
+        batch_sums = []
+        for weight in (w, w * w):
+            batch_sums.append(weight.sum())
+            batch_sums.append(np.concatenate([
+                np.einsum("s,spk->pk", weight, indicators),
+                np.einsum("s,sp->p", weight, trait)[:, None],
+            ], axis=1))
+            batch_sums.append(np.concatenate([
+                np.einsum("s,spk->pk", weight, indicators),
+                np.einsum("s,sp->p", weight, trait * trait)[:, None],
+            ], axis=1))
+        sums = batch_sums if sums is None else [
+            s + b for s, b in zip(sums, batch_sums)
+        ]
+
+    w_sum, wf, wf2, w2_sum, w2f, w2f2 = sums
+    mean = wf / w_sum
+    variance = np.maximum(wf2 / w_sum - mean ** 2, 0)
+    error = np.sqrt(np.maximum(
+        w2f2 - 2 * mean * w2f + mean ** 2 * w2_sum, 0
+    )) / w_sum
+    # When a few samples carry most of the weight both the variance and
+    # the error estimate collapse, so no estimate counts for more than
+    # Kish's effective number of samples, (sum of w) ** 2 / sum of w ** 2
+    kish = w_sum ** 2 / w2_sum
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ess = np.minimum(np.where(variance > 0, variance / error ** 2, kish),
+                         kish)
+    error = np.sqrt(variance / ess)
+    return results(names,
+                   (mean[:, :3], error[:, :3], ess[:, :3]),
+                   (mean[:, 3], error[:, 3], ess[:, 3]))
+
+
+def gibbs(people, samples, chains=50, burn_in=None, seed=None):
+    """
+    Estimate every person's gene and trait distribution given the known
+    traits by Gibbs sampling, running `chains` chains at once until
+    `samples` samples have been kept after `burn_in` sweeps each. By
+    default each chain discards as many sweeps as it keeps, so the
+    burn-in grows with the budget.
+
+    A sweep redraws each person's genes in turn from their distribution
+    given everyone else's: their own inheritance (or prior) times their
+    known trait's probability times each child's inheritance. Genes are
+    estimated by the average of that distribution rather than of the
+    genes drawn from it, so rare gene counts are estimated from every
+    sweep. Unknown traits are summed out, and estimated by the average
+    probability of the trait given the genes.
+
+    Return (probabilities, standard_errors, effective_sizes) as
+    `likelihood_weighting` does, with standard errors found from the
+    spread of the averages of each half of each chain's kept sweeps.
+    Warn if the split-chain R-hat of any estimate is over R_HAT_LIMIT,
+    a sign that the chains have not mixed and the errors are too small.
+    """
+    half = max(2, -(-samples // (2 * chains)))
+    sweeps = 2 * half
+    if burn_in is None:
+        burn_in = sweeps
+
+    rng = np.random.default_rng(seed)
+    names = list(people)
+    n = len(names)
+    mothers, fathers = parent_indexes(people, names)
+    known = np.array([-1 if people[name]["trait"] is None
+                      else int(people[name]["trait"]) for name in names])
+    children = [[] for _ in range(n)]
+    for child in range(n):
+        if mothers[child] >= 0:
+            children[mothers[child]].append(child)
+            children[fathers[child]].append(child)
+    log_prior = np.log(gene_prior())
+    log_inherit = np.log(inheritance())
+    log_likelihood = np.log(trait_table())
+    trait_given_genes = trait_table()[:, 1]
+    copies = np.arange(3)[:, None]
+
+    def sweep(genes):
+        for person in range(n):
+            if mothers[person] < 0:
+                log_p = np.broadcast_to(log_prior[:, None], (3, chains))
+            else:
+                log_p = log_inherit[:, genes[:, mothers[person]],
+                                    genes[:, fathers[person]]]
+            if known[person] >= 0:
+                log_p = log_p + log_likelihood[:, known[person]][:, None]
+            for child in children[person]:
+                mother = np.where(mothers[child] == person, copies,
+                                  genes[:, mothers[child]])
+                father = np.where(fathers[child] == person, copies,
+                                  genes[:, fathers[child]])
+                log_p = log_p + log_inherit[genes[:, child], mother, father]
+            p = np.exp(log_p - log_p.max(axis=0))
+            conditional[:, person] = (p / p.sum(axis=0)).T
+            genes[:, person] = choose(conditional[:, person], rng)
+
+    genes = rng.choice(3, size=(chains, n), p=gene_prior())
+    conditional = np.zeros((chains, n, 3))
+    for _ in range(burn_in):
+        sweep(genes)
+
+    # Sums over each half of each chain's kept sweeps
+    gene_sums = np.zeros((2, chains, n, 3))
+    gene_squares = np.zeros((2, chains, n, 3))
+    trait_sums = np.zeros((2, chains, n))
+    trait_squares = np.zeros((2, chains, n))
+    for i in range(sweeps):
+        sweep(genes)
+        trait = conditional @ trait_given_genes
+        trait[:, known >= 0] = known[known >= 0]
+        gene_sums[i // half] += conditional
+        gene_squares[i // half] += conditional * conditional
+        trait_sums[i // half] += trait
+        trait_squares[i // half] += trait * trait
+
+    stats = []
+    worst = 1
+    for sums, squares in ((gene_sums, gene_squares),
+                          (trait_sums, trait_squares)):
+        sums = sums.reshape(2 * chains, *sums.shape[2:])
+        squares = squares.reshape(sums.shape)
+        chain_means = sums / half
+        mean = chain_means.mean(axis=0)
+        variance = np.maximum(squares.sum(axis=0) / (sweeps * chains)
+                              - mean ** 2, 0)
+        error = chain_means.std(axis=0, ddof=1) / np.sqrt(2 * chains)
+        # Exact estimates, such as for people on their own, differ only
+        # by rounding
+        error[error < 1e-12] = 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ess = np.where(error > 0, variance / error ** 2, sweeps * chains)
+        stats.append((mean, error, ess))
+        worst = max(worst, r_hat(chain_means, squares / half, half).max())
+    if worst > R_HAT_LIMIT:
+        warnings.warn(f"Gibbs chains have not mixed (R-hat {worst:.3f}); "
+                      "standard errors are underestimated", RuntimeWarning)
+    return results(names, *stats)
+
+
+def r_hat(means, mean_squares, length):
+    """
+    Return the potential scale reduction of estimates from chains of
+    `length` samples, given each chain's mean and mean square along the
+    first axis: how much the variance of all the samples exceeds that
+    within each chain, which is near 1 once the chains have mixed.
+    """
+    within = np.maximum(mean_squares - means ** 2, 0) * length / (length - 1)
+    within = within.mean(axis=0)
+    pooled = (length - 1) / length * within + means.var(axis=0, ddof=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(within > 0, np.sqrt(pooled / within), 1)
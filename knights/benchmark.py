@@ -0,0 +1,271 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+import random
+import time
+import tracemalloc
+
+import generator
+import puzzle
+from logic import *
+
+# Largest number of symbols to run truth-table methods on
+MAX_TABLE_SYMBOLS = {"enumerate": 14, "compiled": 24, "parallel": 28}
+
+# Columns of the results written by the suite
+SUITE_FIELDS = [
+    "islanders", "statements", "seed", "symbols", "method", "queries",
+    "seconds", "models", "decisions", "conflicts", "propagations",
+    "peak_bytes",
+]
+
+
+def rename(sentence, suffix):
+    """Returns a copy of `sentence` with `suffix` added to every symbol."""
+    if isinstance(sentence, Symbol):
+        return Symbol(sentence.name + suffix)
+    if isinstance(sentence, Not):
+        return Not(rename(sentence.operand, suffix))
+    if isinstance(sentence, And):
+        return And(*[rename(c, suffix) for c in sentence.conjuncts])
+    if isinstance(sentence, Or):
+        return Or(*[rename(d, suffix) for d in sentence.disjuncts])
+    if isinstance(sentence, Implication):
+        return Implication(rename(sentence.antecedent, suffix),
+                           rename(sentence.consequent, suffix))
+    return Biconditional(rename(sentence.left, suffix),
+                         rename(sentence.right, suffix))
+
+
+def scaled_puzzle(copies):
+    """
+    Returns (knowledge, queries) for `copies` independent copies of
+    puzzle 3 from puzzle.py, each with its own islanders, and every
+    symbol of every copy as a query.
+    """
+    knowledge = And()
+    queries = []
+    symbols = [puzzle.AKnight, puzzle.AKnave, puzzle.BKnight,
+               puzzle.BKnave, puzzle.CKnight, puzzle.CKnave]
+    for i in range(copies):
+        for conjunct in puzzle.knowledge3.conjuncts:
+            knowledge.add(rename(conjunct, f" #{i}"))
+        queries.extend(rename(symbol, f" #{i}") for symbol in symbols)
+    return knowledge, queries
+
+
+def random_3sat(variables, ratio, seed):
+    """
+    Returns a random 3-SAT instance with `variables` symbols and
+    `ratio` clauses per symbol, as a conjunction of disjunctions.
+    """
+    rng = random.Random(seed)
+    symbols = [Symbol(f"x{i}") for i in range(variables)]
+    clauses = []
+    for _ in range(round(variables * ratio)):
+        clauses.append(Or(*[
+            symbol if rng.random() < 0.5 else Not(symbol)
+            for symbol in rng.sample(symbols, 3)
+        ]))
+    return And(*clauses)
+
+
+def methods_for(symbols, requested):
+    return [method for method in requested
+            if symbols <= MAX_TABLE_SYMBOLS.get(method, symbols)]
+
+
+def bench_3sat(args):
+    """
+    Time deciding satisfiability of random 3-SAT instances: a knowledge
+    base is unsatisfiable exactly when it entails a contradiction.
+    """
+    x = Symbol("x0")
+    contradiction = And(x, Not(x))
+    for variables in args.variables:
+        methods = methods_for(variables, args.methods)
+        timings = {method: 0.0 for method in methods}
+        unsatisfiable = 0
+        for seed in range(args.instances):
+            knowledge = random_3sat(variables, args.ratio, seed)
+            results = set()
+            for method in methods:
+                start = time.perf_counter()
+                results.add(model_check(knowledge, contradiction, method))
+                timings[method] += time.perf_counter() - start
+            assert len(results) == 1, f"methods disagree on seed {seed}"
+            unsatisfiable += results.pop()
+        print(f"{variables} variables, {args.instances} instances "
+              f"({unsatisfiable} unsatisfiable)")
+        for method in methods:
+            print(f"  {method:10}{timings[method] / args.instances:.4f}s each")
+
+
+def bench_puzzles(args):
+    """Time answering every query of scaled-up copies of puzzle 3."""
+    for copies in args.copies:
+        knowledge, queries = scaled_puzzle(copies)
+        symbols = len(knowledge.symbols())
+        print(f"{copies} copies of puzzle 3, {symbols} symbols, "
+              f"{len(queries)} queries")
+        answers = {}
+        for method in methods_for(symbols, args.methods):
+            start = time.perf_counter()
+            answers[method] = [model_check(knowledge, query, method)
+                               for query in queries]
+            elapsed = time.perf_counter() - start
+            print(f"  {method:10}{elapsed:.4f}s")
+
+        # The same queries against one KnowledgeBase
+        for method in ("models", "sat"):
+            if method == "models" and symbols > MAX_MODEL_SYMBOLS:
+                continue
+            start = time.perf_counter()
+            kb = KnowledgeBase(knowledge, method)
+            answers[f"kb-{method}"] = [kb.entails(query) for query in queries]
+            elapsed = time.perf_counter() - start
+            print(f"  {'kb-' + method:10}{elapsed:.4f}s")
+        assert len({tuple(a) for a in answers.values()}) == 1
+
+
+def bench_scaling(args):
+    """
+    Time parallel model checking of an entailed query, which has to
+    check every model, on generated puzzles with growing numbers of
+    islanders, each with growing numbers of worker processes.
+    """
+    for islanders in args.islanders:
+        # Take the first seed whose puzzle settles some islander's role
+        for seed in itertools.count():
+            knowledge, queries, _ = generator.generate(
+                islanders, 2 * islanders, seed
+            )
+            kb = KnowledgeBase(knowledge)
+            entailed = [query for query in queries if kb.entails(query)]
+            if entailed:
+                break
+        query = entailed[0]
+        symbols = len(knowledge.symbols())
+        print(f"{islanders} islanders (seed {seed}), {symbols} symbols, "
+              f"2 ** {symbols} models")
+
+        baseline = None
+        for workers in args.workers:
+            start = time.perf_counter()
+            assert parallel_model_check(knowledge, query, workers=workers)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"  {workers:3} workers: {elapsed:.3f}s "
+                  f"({baseline / elapsed:.2f}x)")
+
+
+def bench_suite(args):
+    """
+    Answer every query of generated puzzles with each method, recording
+    solve time, work done (models evaluated, or decisions, conflicts and
+    propagations for the SAT solver) and peak memory, and write the rows
+    to CSV and/or JSON so that runs can be compared.
+
+    Memory is traced in a second, untimed run, since tracing slows
+    allocation down; it covers only this process, not parallel workers.
+    """
+    rows = []
+    for islanders in args.islanders:
+        statements = args.statements or 2 * islanders
+        for seed in range(args.seeds):
+            knowledge, queries, _ = generator.generate(
+                islanders, statements, seed
+            )
+            symbols = len(knowledge.symbols())
+            answers = {}
+            for method in methods_for(symbols, args.methods):
+                stats = {}
+                start = time.perf_counter()
+                answers[method] = [model_check(knowledge, query, method, stats)
+                                   for query in queries]
+                elapsed = time.perf_counter() - start
+
+                tracemalloc.start()
+                for query in queries:
+                    model_check(knowledge, query, method)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+                rows.append({
+                    "islanders": islanders, "statements": statements,
+                    "seed": seed, "symbols": symbols, "method": method,
+                    "queries": len(queries), "seconds": round(elapsed, 6),
+                    **{field: stats.get(field) for field in
+                       ("models", "decisions", "conflicts", "propagations")},
+                    "peak_bytes": peak,
+                })
+            assert len({tuple(a) for a in answers.values()}) == 1, \
+                f"methods disagree on {islanders} islanders, seed {seed}"
+
+    print(f"{'islanders':>9} {'method':10}{'seconds':>10}{'models':>12}"
+          f"{'conflicts':>10}{'peak KiB':>10}")
+    for row in rows:
+        models = "" if row["models"] is None else row["models"]
+        conflicts = "" if row["conflicts"] is None else row["conflicts"]
+        print(f"{row['islanders']:>9} {row['method']:10}"
+              f"{row['seconds']:>10.4f}{models:>12}{conflicts:>10}"
+              f"{row['peak_bytes'] / 1024:>10.1f}")
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=SUITE_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark model checking.")
+    parser.add_argument("--methods", nargs="+",
+                        default=["enumerate", "compiled", "parallel",
+                                 "sat"])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    sat = commands.add_parser("3sat", help="random 3-SAT instances")
+    sat.add_argument("--variables", type=int, nargs="+",
+                     default=[12, 20, 50, 100])
+    sat.add_argument("--ratio", type=float, default=4.26)
+    sat.add_argument("--instances", type=int, default=5)
+    sat.set_defaults(run=bench_3sat)
+
+    puzzles = commands.add_parser("puzzles", help="scaled-up puzzle 3")
+    puzzles.add_argument("--copies", type=int, nargs="+",
+                         default=[1, 2, 4, 20, 100])
+    puzzles.set_defaults(run=bench_puzzles)
+
+    scaling = commands.add_parser(
+        "scaling", help="parallel model checking on 1 to N processes"
+    )
+    scaling.add_argument("--islanders", type=int, nargs="+",
+                         default=[8, 10, 12, 14])
+    scaling.add_argument("--workers", type=int, nargs="+",
+                         default=sorted({1, 2, 4, os.cpu_count()}))
+    scaling.set_defaults(run=bench_scaling)
+
+    suite = commands.add_parser(
+        "suite", help="generated puzzles, written to CSV/JSON"
+    )
+    suite.add_argument("--islanders", type=int, nargs="+",
+                       default=[3, 5, 7, 10, 20])
+    suite.add_argument("--statements", type=int,
+                       help="statements per puzzle (default 2 per islander)")
+    suite.add_argument("--seeds", type=int, default=3)
+    suite.add_argument("--csv", help="write results to this CSV file")
+    suite.add_argument("--json", help="write results to this JSON file")
+    suite.set_defaults(run=bench_suite)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import random
+import sys
+
+from logic import *
+
+
+def generate(islanders, statements, seed=None):
+    """
+    Generate a random knights and knaves puzzle.
+
+    Every one of `islanders` islanders is a knight, who always tells the
+    truth, or a knave, who always lies. `statements` times, a random
+    islander makes a random claim about others (or themself) that is
+    consistent with a hidden assignment, so every puzzle has a solution.
+
+    Return (knowledge, symbols, lines): the puzzle as a sentence, the
+    list of every "X is a Knight"/"X is a Knave" symbol, and the
+    statements as text.
+    """
+    rng = random.Random(seed)
+    names = [islander_name(i) for i in range(islanders)]
+    knights = [Symbol(f"{name} is a Knight") for name in names]
+    knaves = [Symbol(f"{name} is a Knave") for name in names]
+    truth = [rng.random() < 0.5 for _ in names]
+
+    knowledge = And()
+    for knight, knave in zip(knights, knaves):
+        knowledge.add(Or(knight, knave))
+        knowledge.add(Not(And(knight, knave)))
+
+    lines = []
+    for _ in range(statements):
+        speaker = rng.randrange(islanders)
+        while True:
+            claim, text, value = random_claim(rng, names, knights, knaves,
+                                              truth)
+            if value == truth[speaker]:
+                break
+        knowledge.add(Implication(knights[speaker], claim))
+        knowledge.add(Implication(knaves[speaker], Not(claim)))
+        lines.append(f'{names[speaker]} says "{text}"')
+
+    symbols = [symbol for pair in zip(knights, knaves) for symbol in pair]
+    return knowledge, symbols, lines
+
+
+def random_claim(rng, names, knights, knaves, truth):
+    """
+    Return (sentence, text, value) for a random claim about one or two
+    islanders, and whether it holds under assignment `truth`.
+    """
+    if len(names) > 1:
+        y, z = rng.sample(range(len(names)), 2)
+    else:
+        y = z = 0
+    kind = rng.randrange(5)
+    if kind == 0:
+        if rng.random() < 0.5:
+            return knights[y], f"{names[y]} is a knight.", truth[y]
+        return knaves[y], f"{names[y]} is a knave.", not truth[y]
+    if kind == 1:
+        return (And(knaves[y], knaves[z]),
+                f"{names[y]} and {names[z]} are both knaves.",
+                not truth[y] and not truth[z])
+    if kind == 2:
+        return (Or(knights[y], knights[z]),
+                f"{names[y]} or {names[z]} is a knight.",
+                truth[y] or truth[z])
+    if kind == 3:
+        return (Biconditional(knights[y], knights[z]),
+                f"{names[y]} and {names[z]} are the same kind.",
+                truth[y] == truth[z])
+    return (Implication(knights[y], knaves[z]),
+            f"If {names[y]} is a knight, {names[z]} is a knave.",
+            not truth[y] or not truth[z])
+
+
+def islander_name(i):
+    """Return a name for islander `i`: A, B, ..., Z, AA, AB, ..."""
+    name = ""
+    i += 1
+    while i:
+        i, letter = divmod(i - 1, 26)
+        name = chr(ord("A") + letter) + name
+    return name
+
+
+def main():
+    if len(sys.argv) not in [3, 4]:
+        sys.exit("Usage: python generator.py islanders statements [seed]")
+    islanders, statements = int(sys.argv[1]), int(sys.argv[2])
+    seed = int(sys.argv[3]) if len(sys.argv) == 4 else None
+
+    knowledge, symbols, lines = generate(islanders, statements, seed)
+    for line in lines:
+        print(line)
+    print("Solution:")
+    kb = KnowledgeBase(knowledge)
+    for symbol in symbols:
+        if kb.entails(symbol):
+            print(f"    {symbol}")
+
+
+if __name__ == "__main__":
+    main()
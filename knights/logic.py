@@ -1,7 +1,81 @@
+import contextlib
 import itertools
+import multiprocessing
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
+from sat import Solver
 
-class Sentence():
+# Opcodes of compiled sentences
+SYMBOL, NOT, AND, OR, IMPLIES, BICONDITIONAL = range(6)
+
+# Symbols varied within one chunk of bit-parallel models (2 ** 16 models)
+CHUNK_SYMBOLS = 16
+
+# Most symbols a KnowledgeBase keeps every model of before using a solver
+MAX_MODEL_SYMBOLS = 24
+
+# Set by any worker of parallel_model_check that finds a counterexample
+stop_event = None
+
+
+class Interned(type):
+    """
+    Metaclass of sentences. While `Sentence.interning` is on, building a
+    sentence structurally equal to one that already exists returns the
+    existing object, so equal sentences share one node (hash-consing).
+
+    Only frozen sentences are interned: those that cannot change, since
+    neither they nor any sentence within them is an And, which `add`
+    mutates. Frozen sentences also cache their hash and symbols.
+    """
+
+    def __call__(cls, *args):
+        frozen = not cls.mutable and all(
+            arg.frozen for arg in args if isinstance(arg, Sentence)
+        )
+        if frozen and Sentence.interning:
+            key = (cls, args)
+            sentence = Sentence.table.get(key)
+            if sentence is None:
+                sentence = cls.create(frozen, *args)
+                Sentence.table[key] = sentence
+            return sentence
+        return cls.create(frozen, *args)
+
+    def create(cls, frozen, *args):
+        sentence = super().__call__(*args)
+        sentence.frozen = frozen
+        sentence._hash = None
+        sentence._symbols = None
+        return sentence
+
+
+class Sentence(metaclass=Interned):
+    __slots__ = ("frozen", "_hash", "_symbols", "__weakref__")
+
+    # Whether construction returns existing equal sentences, and the
+    # live sentences it returns them from
+    interning = False
+    table = weakref.WeakValueDictionary()
+
+    # Whether sentences of this class can change after construction
+    mutable = False
+
+    def __eq__(self, other):
+        return isinstance(other, Sentence) and self.key() == other.key()
+
+    def __hash__(self):
+        if not self.frozen:
+            return hash(self.key())
+        if self._hash is None:
+            self._hash = hash(self.key())
+        return self._hash
+
+    def key(self):
+        """Returns a tuple identifying the sentence's structure."""
+        raise Exception("nothing to identify")
 
     def evaluate(self, model):
         """Evaluates the logical sentence."""
@@ -13,7 +87,33 @@ class Sentence():
 
     def symbols(self):
         """Returns a set of all symbols in the logical sentence."""
-        return set()
+        return set(self.symbol_set())
+
+    def symbol_set(self):
+        """Returns the sentence's symbols as a frozenset, cached if frozen."""
+        if not self.frozen:
+            return self.find_symbols()
+        if self._symbols is None:
+            self._symbols = self.find_symbols()
+        return self._symbols
+
+    def find_symbols(self):
+        """Returns a frozenset of all symbols in the logical sentence."""
+        return frozenset()
+
+    def compile(self, program, index):
+        """
+        Appends to `program` postfix instructions that evaluate the
+        sentence, where `index` maps each symbol name to its position.
+        """
+        raise Exception("nothing to compile")
+
+    def tseitin(self, cnf):
+        """
+        Adds to `cnf` clauses defining a literal equivalent to the
+        sentence, and returns that literal.
+        """
+        raise Exception("nothing to encode")
 
     @classmethod
     def validate(cls, sentence):
@@ -43,15 +143,13 @@ class Sentence():
 
 
 class Symbol(Sentence):
+    __slots__ = ("name",)
 
     def __init__(self, name):
         self.name = name
 
-    def __eq__(self, other):
-        return isinstance(other, Symbol) and self.name == other.name
-
-    def __hash__(self):
-        return hash(("symbol", self.name))
+    def key(self):
+        return ("symbol", self.name)
 
     def __repr__(self):
         return self.name
@@ -65,20 +163,25 @@ class Symbol(Sentence):
     def formula(self):
         return self.name
 
-    def symbols(self):
-        return {self.name}
+    def find_symbols(self):
+        return frozenset((self.name,))
+
+    def compile(self, program, index):
+        program.append((SYMBOL, index[self.name]))
+
+    def tseitin(self, cnf):
+        return cnf.symbol(self.name)
 
 
 class Not(Sentence):
+    __slots__ = ("operand",)
+
     def __init__(self, operand):
         Sentence.validate(operand)
         self.operand = operand
 
-    def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
-
-    def __hash__(self):
-        return hash(("not", hash(self.operand)))
+    def key(self):
+        return ("not", self.operand)
 
     def __repr__(self):
         return f"Not({self.operand})"
@@ -89,23 +192,28 @@ class Not(Sentence):
     def formula(self):
         return "¬" + Sentence.parenthesize(self.operand.formula())
 
-    def symbols(self):
-        return self.operand.symbols()
+    def find_symbols(self):
+        return self.operand.symbol_set()
+
+    def compile(self, program, index):
+        self.operand.compile(program, index)
+        program.append((NOT, None))
+
+    def tseitin(self, cnf):
+        return -cnf.literal(self.operand)
 
 
 class And(Sentence):
+    __slots__ = ("conjuncts",)
+    mutable = True
+
     def __init__(self, *conjuncts):
         for conjunct in conjuncts:
             Sentence.validate(conjunct)
         self.conjuncts = list(conjuncts)
 
-    def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
-
-    def __hash__(self):
-        return hash(
-            ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
-        )
+    def key(self):
+        return ("and", tuple(self.conjuncts))
 
     def __repr__(self):
         conjunctions = ", ".join(
@@ -114,6 +222,10 @@ class And(Sentence):
         return f"And({conjunctions})"
 
     def add(self, conjunct):
+        """
+        Adds a conjunct in place. An And is never interned, so no other
+        sentence sees the change unless it holds this And.
+        """
         Sentence.validate(conjunct)
         self.conjuncts.append(conjunct)
 
@@ -126,23 +238,35 @@ class And(Sentence):
         return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
                            for conjunct in self.conjuncts])
 
-    def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+    def find_symbols(self):
+        return frozenset().union(
+            *[conjunct.symbol_set() for conjunct in self.conjuncts]
+        )
+
+    def compile(self, program, index):
+        for conjunct in self.conjuncts:
+            conjunct.compile(program, index)
+        program.append((AND, len(self.conjuncts)))
+
+    def tseitin(self, cnf):
+        literals = [cnf.literal(conjunct) for conjunct in self.conjuncts]
+        x = cnf.new_var()
+        for literal in literals:
+            cnf.add_clause([-x, literal])
+        cnf.add_clause([x] + [-literal for literal in literals])
+        return x
 
 
 class Or(Sentence):
+    __slots__ = ("disjuncts",)
+
     def __init__(self, *disjuncts):
         for disjunct in disjuncts:
             Sentence.validate(disjunct)
         self.disjuncts = list(disjuncts)
 
-    def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
-
-    def __hash__(self):
-        return hash(
-            ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
-        )
+    def key(self):
+        return ("or", tuple(self.disjuncts))
 
     def __repr__(self):
         disjuncts = ", ".join([str(disjunct) for disjunct in self.disjuncts])
@@ -157,24 +281,36 @@ class Or(Sentence):
         return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
                             for disjunct in self.disjuncts])
 
-    def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+    def find_symbols(self):
+        return frozenset().union(
+            *[disjunct.symbol_set() for disjunct in self.disjuncts]
+        )
+
+    def compile(self, program, index):
+        for disjunct in self.disjuncts:
+            disjunct.compile(program, index)
+        program.append((OR, len(self.disjuncts)))
+
+    def tseitin(self, cnf):
+        literals = [cnf.literal(disjunct) for disjunct in self.disjuncts]
+        x = cnf.new_var()
+        for literal in literals:
+            cnf.add_clause([x, -literal])
+        cnf.add_clause([-x] + literals)
+        return x
 
 
 class Implication(Sentence):
+    __slots__ = ("antecedent", "consequent")
+
     def __init__(self, antecedent, consequent):
         Sentence.validate(antecedent)
         Sentence.validate(consequent)
         self.antecedent = antecedent
         self.consequent = consequent
 
-    def __eq__(self, other):
-        return (isinstance(other, Implication)
-                and self.antecedent == other.antecedent
-                and self.consequent == other.consequent)
-
-    def __hash__(self):
-        return hash(("implies", hash(self.antecedent), hash(self.consequent)))
+    def key(self):
+        return ("implies", self.antecedent, self.consequent)
 
     def __repr__(self):
         return f"Implication({self.antecedent}, {self.consequent})"
@@ -188,24 +324,35 @@ class Implication(Sentence):
         consequent = Sentence.parenthesize(self.consequent.formula())
         return f"{antecedent} => {consequent}"
 
-    def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+    def find_symbols(self):
+        return self.antecedent.symbol_set() | self.consequent.symbol_set()
+
+    def compile(self, program, index):
+        self.antecedent.compile(program, index)
+        self.consequent.compile(program, index)
+        program.append((IMPLIES, None))
+
+    def tseitin(self, cnf):
+        a = cnf.literal(self.antecedent)
+        b = cnf.literal(self.consequent)
+        x = cnf.new_var()
+        cnf.add_clause([-x, -a, b])
+        cnf.add_clause([x, a])
+        cnf.add_clause([x, -b])
+        return x
 
 
 class Biconditional(Sentence):
+    __slots__ = ("left", "right")
+
     def __init__(self, left, right):
         Sentence.validate(left)
         Sentence.validate(right)
         self.left = left
         self.right = right
 
-    def __eq__(self, other):
-        return (isinstance(other, Biconditional)
-                and self.left == other.left
-                and self.right == other.right)
-
-    def __hash__(self):
-        return hash(("biconditional", hash(self.left), hash(self.right)))
+    def key(self):
+        return ("biconditional", self.left, self.right)
 
     def __repr__(self):
         return f"Biconditional({self.left}, {self.right})"
@@ -221,18 +368,72 @@ class Biconditional(Sentence):
         right = Sentence.parenthesize(str(self.right))
         return f"{left} <=> {right}"
 
-    def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
-
-
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
+    def find_symbols(self):
+        return self.left.symbol_set() | self.right.symbol_set()
+
+    def compile(self, program, index):
+        self.left.compile(program, index)
+        self.right.compile(program, index)
+        program.append((BICONDITIONAL, None))
+
+    def tseitin(self, cnf):
+        a = cnf.literal(self.left)
+        b = cnf.literal(self.right)
+        x = cnf.new_var()
+        cnf.add_clause([-x, -a, b])
+        cnf.add_clause([-x, a, -b])
+        cnf.add_clause([x, a, b])
+        cnf.add_clause([x, -a, -b])
+        return x
+
+
+@contextlib.contextmanager
+def interning():
+    """
+    Context manager in which structurally equal frozen sentences are
+    built as one shared object. Every And, and every sentence holding
+    one, is still built afresh.
+    """
+    previous = Sentence.interning
+    Sentence.interning = True
+    try:
+        yield
+    finally:
+        Sentence.interning = previous
+
+
+def model_check(knowledge, query, method="compiled", stats=None):
+    """
+    Checks if knowledge base entails query.
+
+    `method` is "compiled" to evaluate compiled sentences over many
+    models at once (see `compiled_model_check`), "sat" to ask a SAT
+    solver (see `sat_model_check`), "parallel" to split compiled model
+    checking across processes (see `parallel_model_check`), or
+    "enumerate" to evaluate the sentences once per model.
+
+    If `stats` is a dict, the work done is added to it: the number of
+    "models" evaluated, or for "sat" the solver's "decisions",
+    "conflicts" and "propagations".
+    """
+    if method == "compiled":
+        return compiled_model_check(knowledge, query, stats)
+    if method == "sat":
+        return sat_model_check(knowledge, query, stats)
+    if method == "parallel":
+        return parallel_model_check(knowledge, query, stats=stats)
+    if method != "enumerate":
+        raise ValueError(f"unknown model checking method: {method}")
+    models = 0
 
     def check_all(knowledge, query, symbols, model):
         """Checks if knowledge base entails query, given a particular model."""
 
+        nonlocal models
+
         # If model has an assignment for each symbol
         if not symbols:
+            models += 1
 
             # If knowledge base is true in model, then query must also be true
             if knowledge.evaluate(model):
@@ -260,4 +461,336 @@ def model_check(knowledge, query):
     symbols = set.union(knowledge.symbols(), query.symbols())
 
     # Check that knowledge entails query
-    return check_all(knowledge, query, symbols, dict())
+    entailed = check_all(knowledge, query, symbols, dict())
+    add_counts(stats, models=models)
+    return entailed
+
+
+def add_counts(stats, **counts):
+    """Adds `counts` to dict `stats`, if there is one."""
+    if stats is not None:
+        for name, value in counts.items():
+            stats[name] = stats.get(name, 0) + value
+
+
+def compile_sentence(sentence, symbols):
+    """
+    Compiles a sentence into a flat list of postfix instructions over
+    the symbol names in list `symbols`.
+    """
+    program = []
+    sentence.compile(program, {name: i for i, name in enumerate(symbols)})
+    return program
+
+
+def run(program, values, mask):
+    """
+    Evaluates a compiled sentence in many models at once. `values[i]` is
+    an integer whose bit j is the value of symbol i in model j, and
+    `mask` has a bit set for every model. Returns the integer whose bit j
+    is the truth of the sentence in model j.
+    """
+    stack = []
+    for op, arg in program:
+        if op == SYMBOL:
+            stack.append(values[arg])
+        elif op == NOT:
+            stack.append(mask ^ stack.pop())
+        elif op == AND:
+            result = mask
+            for operand in stack[len(stack) - arg:]:
+                result &= operand
+            del stack[len(stack) - arg:]
+            stack.append(result)
+        elif op == OR:
+            result = 0
+            for operand in stack[len(stack) - arg:]:
+                result |= operand
+            del stack[len(stack) - arg:]
+            stack.append(result)
+        elif op == IMPLIES:
+            consequent = stack.pop()
+            stack.append((mask ^ stack.pop()) | consequent)
+        else:
+            right = stack.pop()
+            stack.append(mask ^ (stack.pop() ^ right))
+    return stack.pop()
+
+
+def pattern(i, width):
+    """
+    Returns the values of symbol `i` in all 2 ** `width` models of
+    `width` symbols as an integer: bit j is set if bit i of j is.
+    """
+    period = 2 << i
+    bits = ((1 << (1 << i)) - 1) << (1 << i)
+    while period < 1 << width:
+        bits |= bits << period
+        period *= 2
+    return bits
+
+
+def chunks(n, start=0, stop=None):
+    """
+    Yields (values, mask) for every chunk of the 2 ** n models of `n`
+    symbols, or only for chunks `start` up to `stop`. The first
+    CHUNK_SYMBOLS symbols take every combination within a chunk, one
+    model per bit; the rest are fixed per chunk, symbol CHUNK_SYMBOLS + i
+    to bit i of the chunk number.
+    """
+    width = min(n, CHUNK_SYMBOLS)
+    mask = (1 << (1 << width)) - 1
+    patterns = [pattern(i, width) for i in range(width)]
+    if stop is None:
+        stop = 1 << (n - width)
+    for chunk in range(start, stop):
+        fixed = [mask if chunk >> i & 1 else 0 for i in range(n - width)]
+        yield patterns + fixed, mask
+
+
+def compiled_model_check(knowledge, query, stats=None):
+    """
+    Checks if knowledge base entails query by compiling both once and
+    evaluating them bit-parallel over chunks of models, stopping at the
+    first chunk holding a model where knowledge is true and query false.
+    """
+    symbols = sorted(knowledge.symbol_set() | query.symbol_set())
+    knowledge = compile_sentence(knowledge, symbols)
+    query = compile_sentence(query, symbols)
+    entailed, models = check_chunks(knowledge, query, len(symbols), 0, None)
+    add_counts(stats, models=models)
+    return entailed
+
+
+def check_chunks(knowledge, query, n, start, stop):
+    """
+    Checks compiled knowledge and query over chunks `start` up to `stop`
+    of the models of `n` symbols, returning (entailed, number of models
+    evaluated). Stops with entailed False as soon as a model has
+    knowledge true and query false, setting `stop_event` if there is one;
+    gives up (with entailed True) once it has been set by another process.
+    """
+    evaluated = 0
+    for values, mask in chunks(n, start, stop):
+        if stop_event is not None and stop_event.is_set():
+            return True, evaluated
+        evaluated += mask.bit_length()
+        models = run(knowledge, values, mask)
+        if models and models & ~run(query, values, mask):
+            if stop_event is not None:
+                stop_event.set()
+            return False, evaluated
+    return True, evaluated
+
+
+def init_worker(event):
+    """Shares the stop flag of `parallel_model_check` with a worker."""
+    global stop_event
+    stop_event = event
+
+
+def parallel_model_check(knowledge, query, workers=None, split=None,
+                         stats=None):
+    """
+    Checks if knowledge base entails query like `compiled_model_check`,
+    splitting the models into 2 ** `split` subspaces, each with a fixed
+    assignment of `split` symbols, and checking them on a pool of
+    `workers` processes. Every worker stops once any finds a model where
+    knowledge is true and query false.
+
+    By default `split` gives each worker about four subspaces. The models
+    evaluated by all workers are added to `stats` as in `model_check`.
+    """
+    symbols = sorted(knowledge.symbol_set() | query.symbol_set())
+    knowledge = compile_sentence(knowledge, symbols)
+    query = compile_sentence(query, symbols)
+
+    n = len(symbols)
+    fixed = n - min(n, CHUNK_SYMBOLS)
+    workers = workers or os.cpu_count()
+    if split is None:
+        split = (4 * workers - 1).bit_length()
+    split = min(split, fixed)
+    if split == 0:
+        entailed, models = check_chunks(knowledge, query, n, 0, None)
+        add_counts(stats, models=models)
+        return entailed
+
+    total = 1 << fixed
+    step = total >> split
+    event = multiprocessing.Event()
+    with ProcessPoolExecutor(workers, initializer=init_worker,
+                             initargs=(event,)) as pool:
+        futures = [
+            pool.submit(check_chunks, knowledge, query, n, start, start + step)
+            for start in range(0, total, step)
+        ]
+        entailed = True
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+            result, models = future.result()
+            add_counts(stats, models=models)
+            if not result:
+                entailed = False
+                event.set()
+                for other in futures:
+                    other.cancel()
+    return entailed
+
+
+class CNF():
+    """
+    Tseitin encoding of sentences into the clauses of a SAT `Solver`:
+    every compound subsentence gets a fresh variable defined to be
+    equivalent to it, so the clauses grow linearly with the sentences.
+    """
+
+    def __init__(self, solver=None):
+        self.solver = solver or Solver()
+        self.symbols = {}
+        self.literals = {}
+
+    def new_var(self):
+        return self.solver.new_var()
+
+    def add_clause(self, literals):
+        self.solver.add_clause(literals)
+
+    def symbol(self, name):
+        """Returns the variable of the symbol called `name`."""
+        if name not in self.symbols:
+            self.symbols[name] = self.new_var()
+        return self.symbols[name]
+
+    def literal(self, sentence):
+        """
+        Returns a literal equivalent to `sentence`, encoding each
+        sentence object only once.
+        """
+        key = id(sentence)
+        if key not in self.literals:
+            self.literals[key] = (sentence, sentence.tseitin(self))
+        return self.literals[key][1]
+
+    def add(self, sentence):
+        """
+        Adds clauses requiring `sentence` to be true. Conjunctions are
+        split and disjunctions become a single clause, without new
+        variables.
+        """
+        if isinstance(sentence, And):
+            for conjunct in sentence.conjuncts:
+                self.add(conjunct)
+        elif isinstance(sentence, Or):
+            self.add_clause([self.literal(disjunct)
+                             for disjunct in sentence.disjuncts])
+        else:
+            self.add_clause([self.literal(sentence)])
+
+
+def sat_model_check(knowledge, query, stats=None):
+    """
+    Checks if knowledge base entails query by asking a SAT solver whether
+    knowledge together with the negation of query is unsatisfiable.
+    """
+    cnf = CNF()
+    cnf.add(knowledge)
+    entailed = not cnf.solver.solve([-cnf.literal(query)])
+    add_counts(stats, decisions=cnf.solver.decisions,
+               conflicts=cnf.solver.conflicts,
+               propagations=cnf.solver.propagations)
+    return entailed
+
+
+class KnowledgeBase():
+    """
+    Knowledge that answers many entailment queries without starting over
+    for each one.
+
+    With method "models", every model of the knowledge is kept as one
+    bit-parallel integer (bit j set if model j satisfies it), so a query
+    is a single compiled evaluation. With method "sat", the knowledge is
+    kept in a SAT solver whose learned clauses carry over between
+    queries. Method "auto" keeps models until there are more than
+    MAX_MODEL_SYMBOLS symbols, then moves to a solver.
+
+    Conjuncts added later, with `add` or with `And.add` on the knowledge,
+    are folded into the models or solver on the next query.
+    """
+
+    def __init__(self, knowledge, method="auto"):
+        if method not in ("auto", "models", "sat"):
+            raise ValueError(f"unknown knowledge base method: {method}")
+        if not isinstance(knowledge, And):
+            knowledge = And(knowledge)
+        self.knowledge = knowledge
+        self.method = method
+        self.added = 0
+
+        # Symbol names in model bit order, their patterns, and the models
+        self.symbols = []
+        self.patterns = []
+        self.models = 1
+        self.cnf = None
+        if method == "sat":
+            self.cnf = CNF()
+        self.update()
+
+    def add(self, sentence):
+        """Adds a conjunct to the knowledge."""
+        self.knowledge.add(sentence)
+        self.update()
+
+    def update(self):
+        """Folds conjuncts not yet seen into the models or solver."""
+        for conjunct in self.knowledge.conjuncts[self.added:]:
+            if self.cnf is not None:
+                self.cnf.add(conjunct)
+            else:
+                self.extend(conjunct.symbol_set())
+                if self.cnf is None:
+                    self.models &= self.evaluate(conjunct)
+                else:
+                    self.cnf.add(conjunct)
+            self.added += 1
+
+    def extend(self, symbols):
+        """
+        Adds any new `symbols` to the model space, doubling the models
+        for each, or moves to a solver if there would be too many.
+        """
+        new = sorted(symbols - set(self.symbols))
+        if not new:
+            return
+        if len(self.symbols) + len(new) > MAX_MODEL_SYMBOLS:
+            if self.method == "models":
+                raise ValueError(
+                    f"more than {MAX_MODEL_SYMBOLS} symbols to keep models of"
+                )
+            self.cnf = CNF()
+            for conjunct in self.knowledge.conjuncts[:self.added]:
+                self.cnf.add(conjunct)
+            self.patterns = self.models = None
+            return
+
+        for name in new:
+            size = 1 << len(self.symbols)
+            self.models |= self.models << size
+            self.patterns = [p | p << size for p in self.patterns]
+            self.patterns.append(((1 << size) - 1) << size)
+            self.symbols.append(name)
+
+    def evaluate(self, sentence):
+        """Returns the models in which `sentence` is true."""
+        program = compile_sentence(sentence, self.symbols)
+        return run(program, self.patterns, (1 << (1 << len(self.symbols))) - 1)
+
+    def entails(self, query):
+        """Checks if the knowledge entails query."""
+        self.update()
+        if self.cnf is None:
+            self.extend(query.symbol_set())
+        if self.cnf is not None:
+            return not self.cnf.solver.solve([-self.cnf.literal(query)])
+        return not self.models & ~self.evaluate(query)
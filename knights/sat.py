@@ -0,0 +1,290 @@
+import heapq
+
+
+class Solver():
+    """
+    Conflict-driven clause learning SAT solver.
+
+    Variables are positive integers and literals are non-zero integers,
+    negative for a negated variable (as in DIMACS). Clauses can be added
+    between calls to `solve`, and each call can take assumptions, so one
+    solver can answer many related questions, keeping what it learned.
+    """
+
+    def __init__(self):
+        self.num_vars = 0
+        self.ok = True
+
+        # Per variable, indexed from 1: value (1 true, -1 false, 0 unset),
+        # decision level, reason clause, activity and saved phase
+        self.assign = [0]
+        self.level = [0]
+        self.reason = [None]
+        self.activity = [0.0]
+        self.phase = [False]
+
+        self.watches = {}
+        self.trail = []
+        self.trail_lim = []
+        self.qhead = 0
+        self.order = []
+        self.increment = 1.0
+
+        self.model = None
+        self.conflicts = 0
+        self.decisions = 0
+        self.propagations = 0
+
+    def new_var(self):
+        """Returns a new variable."""
+        self.num_vars += 1
+        var = self.num_vars
+        self.assign.append(0)
+        self.level.append(0)
+        self.reason.append(None)
+        self.activity.append(0.0)
+        self.phase.append(False)
+        self.watches[var] = []
+        self.watches[-var] = []
+        heapq.heappush(self.order, (0.0, var))
+        return var
+
+    def value(self, literal):
+        """Returns 1 if `literal` is true, -1 if false and 0 if unset."""
+        value = self.assign[abs(literal)]
+        return value if literal > 0 else -value
+
+    def add_clause(self, literals):
+        """
+        Adds a clause (an iterable of literals, at least one of which must
+        be true). Returns False if the clauses are now unsatisfiable.
+        """
+        if not self.ok:
+            return False
+        self.backtrack(0)
+
+        clause = []
+        for literal in literals:
+            value = self.value(literal)
+            if value == 1 or -literal in clause:
+                return True
+            if value == 0 and literal not in clause:
+                clause.append(literal)
+
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self.enqueue(clause[0], None)
+            self.ok = self.propagate() is None
+        else:
+            self.watch(clause)
+        return self.ok
+
+    def watch(self, clause):
+        self.watches[clause[0]].append(clause)
+        self.watches[clause[1]].append(clause)
+
+    def enqueue(self, literal, reason):
+        var = abs(literal)
+        self.assign[var] = 1 if literal > 0 else -1
+        self.level[var] = len(self.trail_lim)
+        self.reason[var] = reason
+        self.trail.append(literal)
+
+    def propagate(self):
+        """
+        Assigns every literal implied by unit clauses, watching two
+        literals of each clause. Returns a conflicting clause, or None.
+        """
+        while self.qhead < len(self.trail):
+            false_literal = -self.trail[self.qhead]
+            self.qhead += 1
+            self.propagations += 1
+            watchers = self.watches[false_literal]
+            self.watches[false_literal] = kept = []
+
+            for i, clause in enumerate(watchers):
+                if clause[0] == false_literal:
+                    clause[0], clause[1] = clause[1], clause[0]
+                first = clause[0]
+                if self.value(first) == 1:
+                    kept.append(clause)
+                    continue
+
+                # Look for a new literal to watch instead
+                for k in range(2, len(clause)):
+                    if self.value(clause[k]) != -1:
+                        clause[1], clause[k] = clause[k], clause[1]
+                        self.watches[clause[1]].append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if self.value(first) == -1:
+                        kept.extend(watchers[i + 1:])
+                        self.qhead = len(self.trail)
+                        return clause
+                    self.enqueue(first, clause)
+        return None
+
+    def analyze(self, conflict):
+        """
+        Returns (learnt clause, backjump level) for a conflict, cutting at
+        the first unique implication point. The clause's first literal is
+        the one it asserts after backjumping, its second the one assigned
+        at the backjump level.
+        """
+        seen = set()
+        learnt = [None]
+        current = len(self.trail_lim)
+        pending = 0
+        index = len(self.trail) - 1
+        literals = conflict
+        while True:
+            for literal in literals:
+                var = abs(literal)
+                if var not in seen and self.level[var] > 0:
+                    seen.add(var)
+                    self.bump(var)
+                    if self.level[var] == current:
+                        pending += 1
+                    else:
+                        learnt.append(literal)
+
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            literal = self.trail[index]
+            index -= 1
+            pending -= 1
+            if pending == 0:
+                break
+            literals = self.reason[abs(literal)][1:]
+
+        learnt[0] = -literal
+        if len(learnt) == 1:
+            return learnt, 0
+        deepest = max(range(1, len(learnt)),
+                      key=lambda i: self.level[abs(learnt[i])])
+        learnt[1], learnt[deepest] = learnt[deepest], learnt[1]
+        return learnt, self.level[abs(learnt[1])]
+
+    def bump(self, var):
+        self.activity[var] += self.increment
+        if self.activity[var] > 1e100:
+            self.activity = [activity * 1e-100 for activity in self.activity]
+            self.increment *= 1e-100
+            self.order = [(-self.activity[v], v)
+                          for v in range(1, self.num_vars + 1)
+                          if not self.assign[v]]
+            heapq.heapify(self.order)
+        elif not self.assign[var]:
+            heapq.heappush(self.order, (-self.activity[var], var))
+
+    def backtrack(self, level):
+        """Undoes every assignment made above decision level `level`."""
+        if len(self.trail_lim) <= level:
+            return
+        start = self.trail_lim[level]
+        for literal in self.trail[start:]:
+            var = abs(literal)
+            self.phase[var] = literal > 0
+            self.assign[var] = 0
+            self.reason[var] = None
+            heapq.heappush(self.order, (-self.activity[var], var))
+        del self.trail[start:]
+        del self.trail_lim[level:]
+        self.qhead = len(self.trail)
+
+    def decide(self):
+        """Returns the unset variable with the highest activity, or None."""
+        while self.order:
+            var = heapq.heappop(self.order)[1]
+            if not self.assign[var]:
+                return var
+        return None
+
+    def solve(self, assumptions=()):
+        """
+        Returns True if the clauses are satisfiable with every literal in
+        `assumptions` true, storing a satisfying assignment in `model`
+        (a dict of variable to bool); returns False otherwise.
+        """
+        self.model = None
+        if not self.ok:
+            return False
+        self.backtrack(0)
+
+        restart = 0
+        while True:
+            budget = 100 * luby(restart)
+            restart += 1
+            result = self.search(budget, list(assumptions))
+            if result is not None:
+                self.backtrack(0)
+                return result
+
+    def search(self, budget, assumptions):
+        """
+        Runs CDCL until a result or `budget` conflicts, after which it
+        restarts (returning None).
+        """
+        conflicts = 0
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                conflicts += 1
+                if not self.trail_lim:
+                    self.ok = False
+                    return False
+                learnt, level = self.analyze(conflict)
+                self.backtrack(level)
+                if len(learnt) == 1:
+                    self.enqueue(learnt[0], None)
+                else:
+                    self.watch(learnt)
+                    self.enqueue(learnt[0], learnt)
+                self.increment /= 0.95
+                continue
+
+            if conflicts >= budget:
+                self.backtrack(0)
+                return None
+
+            # Assumptions are the first decisions
+            literal = None
+            while len(self.trail_lim) < len(assumptions):
+                assumption = assumptions[len(self.trail_lim)]
+                value = self.value(assumption)
+                if value == -1:
+                    return False
+                self.trail_lim.append(len(self.trail))
+                if value == 0:
+                    literal = assumption
+                    break
+
+            if literal is None:
+                var = self.decide()
+                if var is None:
+                    self.model = {
+                        v: self.assign[v] > 0
+                        for v in range(1, self.num_vars + 1)
+                    }
+                    return True
+                literal = var if self.phase[var] else -var
+                self.trail_lim.append(len(self.trail))
+
+            self.decisions += 1
+            self.enqueue(literal, None)
+
+
+def luby(i):
+    """Returns term `i` (from 0) of the Luby restart sequence 1 1 2 1 1 2 4..."""
+    size, exponent = 1, 0
+    while size < i + 1:
+        exponent += 1
+        size = 2 * size + 1
+    while size - 1 != i:
+        size = (size - 1) // 2
+        exponent -= 1
+        i %= size
+    return 1 << exponent
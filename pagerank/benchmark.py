@@ -0,0 +1,353 @@
+import argparse
+import copy
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import crawler
+import pagerank
+from graph import LinkGraph
+
+
+def synthetic_edges(pages, links, dangling=0.1, seed=0):
+    """
+    Return (sources, targets) of a random graph on `pages` pages with an
+    average of `links` links per page. A fraction `dangling` of pages link
+    nowhere, and link targets are skewed towards low-numbered pages so
+    that ranks are far from uniform.
+    """
+    rng = np.random.default_rng(seed)
+    n_links = pages * links
+    sources = rng.integers(0, pages, n_links)
+    sources = sources[sources >= int(pages * dangling)]
+    targets = (pages * rng.random(len(sources)) ** 2).astype(np.int64)
+    return sources, targets
+
+
+def synthetic_corpus(pages, links, dangling=0.1, seed=0):
+    """Return a `crawl`-style corpus of the same kind of random graph."""
+    sources, targets = synthetic_edges(pages, links, dangling, seed)
+    corpus = {f"{i}.html": set() for i in range(pages)}
+    for source, target in zip(sources.tolist(), targets.tolist()):
+        if source != target:
+            corpus[f"{source}.html"].add(f"{target}.html")
+    return corpus
+
+
+def write_synthetic_corpus(directory, pages, links, words=200, seed=0):
+    """
+    Write the same kind of random graph as `synthetic_corpus` to
+    `directory` as HTML pages, each with `words` words of filler text
+    around its links.
+    """
+    corpus = synthetic_corpus(pages, links, seed=seed)
+    filler = " ".join(["lorem"] * words)
+    for page, targets in corpus.items():
+        with open(os.path.join(directory, page), "w") as f:
+            f.write(f"<!DOCTYPE html>\n<html>\n<body>\n<p>{filler}</p>\n")
+            for target in sorted(targets):
+                f.write(f'<a class="link" href="{target}">{target}</a>\n')
+            f.write(f"<p>{filler}</p>\n</body>\n</html>\n")
+
+
+def bench_corpora(args):
+    """
+    Check that sparse iteration agrees with `iterate_pagerank` on the
+    sample corpora and a small random corpus, and time both.
+    """
+    corpora = {directory: pagerank.crawl(directory)
+               for directory in args.directories}
+    corpora[f"random {args.pages}"] = synthetic_corpus(args.pages, args.links)
+    for name, corpus in corpora.items():
+        start = time.perf_counter()
+        expected = pagerank.iterate_pagerank(corpus, pagerank.DAMPING)
+        iterate_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        ranks, iterations = pagerank.sparse_pagerank(corpus, pagerank.DAMPING)
+        sparse_time = time.perf_counter() - start
+
+        error = max(abs(ranks[page] - expected[page]) for page in corpus)
+        assert error < 1e-8, f"{name}: ranks differ by {error}"
+        print(f"{name}: {len(corpus)} pages, max difference {error:.1e}")
+        print(f"  iterate  {iterate_time:.4f}s")
+        print(f"  sparse   {sparse_time:.4f}s ({iterations} iterations)")
+
+
+def bench_sampling(args):
+    """
+    Time `sample_pagerank` against batched sampling, measuring how far
+    each estimate is from the ranks found by sparse iteration.
+    """
+    corpora = {directory: pagerank.crawl(directory)
+               for directory in args.directories}
+    corpora[f"random {args.pages}"] = synthetic_corpus(args.pages, args.links)
+    for name, corpus in corpora.items():
+        exact, _ = pagerank.sparse_pagerank(corpus, pagerank.DAMPING)
+        print(f"{name}: {len(corpus)} pages")
+        for samples in args.samples:
+            timings = {}
+            if samples <= args.max_legacy_samples:
+                start = time.perf_counter()
+                ranks = pagerank.sample_pagerank(corpus, pagerank.DAMPING,
+                                                 samples)
+                timings["sample"] = (time.perf_counter() - start, ranks)
+            start = time.perf_counter()
+            ranks = pagerank.batch_sample_pagerank(
+                corpus, pagerank.DAMPING, samples, args.walkers, seed=0
+            )
+            timings["batched"] = (time.perf_counter() - start, ranks)
+            for method, (elapsed, ranks) in timings.items():
+                error = sum(abs(ranks[page] - exact[page]) for page in corpus)
+                print(f"  {samples:>10} {method:8}{elapsed:9.4f}s "
+                      f"L1 error {error:.4f}")
+
+
+def bench_crawl(args):
+    """
+    Time `pagerank.crawl` against `crawler.crawl` on a generated corpus,
+    with growing numbers of processes, checking that the results agree.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        write_synthetic_corpus(directory, args.pages, args.links)
+        print(f"{args.pages} pages")
+
+        start = time.perf_counter()
+        expected = pagerank.crawl(directory)
+        print(f"  crawl          {time.perf_counter() - start:.3f}s")
+
+        for workers in args.workers:
+            start = time.perf_counter()
+            pages, sources, targets = crawler.crawl_edges(directory, workers)
+            edges_time = time.perf_counter() - start
+            assert crawler.crawl(directory, workers) == expected
+            print(f"  {workers:3} processes  {edges_time:.3f}s "
+                  f"({len(sources)} links)")
+
+
+def random_changes(corpus, changes, seed=0):
+    """
+    Return keyword arguments for `IncrementalPageRank.update` making
+    about `changes` random changes to `corpus`: mostly added and removed
+    links, with a few pages added and removed.
+    """
+    rng = random.Random(seed)
+    pages = sorted(corpus)
+    linked = [page for page in pages if corpus[page]]
+    added_pages = [f"new{i}.html" for i in range(max(1, changes // 100))]
+    removed_pages = rng.sample(pages, max(1, changes // 100))
+    removed_links = []
+    for page in rng.sample(linked, min(len(linked), changes // 2)):
+        removed_links.append((page, rng.choice(sorted(corpus[page]))))
+    everyone = pages + added_pages
+    added_links = [(rng.choice(everyone), rng.choice(everyone))
+                   for _ in range(changes // 2)]
+    return {"added_pages": added_pages, "removed_pages": removed_pages,
+            "added_links": added_links, "removed_links": removed_links}
+
+
+def apply_changes(corpus, added_pages, removed_pages, added_links,
+                  removed_links):
+    """Return a copy of `corpus` with changes from `random_changes`."""
+    corpus = copy.deepcopy(corpus)
+    for page in added_pages:
+        corpus.setdefault(page, set())
+    for page, link in removed_links:
+        corpus[page].discard(link)
+    for page, link in added_links:
+        if page != link:
+            corpus[page].add(link)
+    for page in removed_pages:
+        del corpus[page]
+    for links in corpus.values():
+        links.difference_update(removed_pages)
+    return corpus
+
+
+def bench_update(args):
+    """
+    Time updating PageRank after random changes to a corpus with
+    `IncrementalPageRank`, by warm-started power iteration and by push,
+    against power iteration from uniform ranks on the same patched
+    graph, and report how far each is from the latter. Patching the
+    graph is timed apart from finding the ranks again, and the patched
+    graph is checked against one built from the changed corpus.
+    """
+    corpus = synthetic_corpus(args.pages, args.links)
+    print(f"random {args.pages}: {args.pages} pages, push tolerance "
+          f"{args.push_tolerance:g}")
+    print(f"  {'changes':>7}  {'method':6}{'patch':>9}{'rank':>9}"
+          f"{'iterations':>12}{'max error':>12}{'L1 error':>12}")
+    for changes in args.changes:
+        edits = random_changes(corpus, changes)
+        results = {}
+        for method, push_tolerance in (("warm", None),
+                                       ("push", args.push_tolerance)):
+            incremental = pagerank.IncrementalPageRank(
+                corpus, pagerank.DAMPING, push_tolerance=push_tolerance
+            )
+            start = time.perf_counter()
+            incremental.patch(**edits)
+            patched = time.perf_counter()
+            iterations = incremental.rerank()
+            results[method] = (patched - start,
+                               time.perf_counter() - patched, iterations,
+                               incremental.values)
+
+        graph = incremental.graph
+        start = time.perf_counter()
+        expected, cold = graph.pagerank(pagerank.DAMPING)
+        results["cold"] = (None, time.perf_counter() - start, cold, expected)
+
+        rebuilt, _ = pagerank.sparse_pagerank(
+            apply_changes(corpus, **edits), pagerank.DAMPING
+        )
+        error = max(abs(rebuilt[page] - rank)
+                    for page, rank in zip(graph.pages, expected.tolist()))
+        assert error < 1e-8, f"{changes} changes: patched graph differs"
+
+        for method, (patch, elapsed, iterations, ranks) in results.items():
+            difference = np.abs(ranks - expected)
+            patch = "" if patch is None else f"{patch:8.3f}s"
+            print(f"  {changes:>7}  {method:6}{patch:>9}{elapsed:8.3f}s"
+                  f"{iterations:12.2f}{difference.max():12.1e}"
+                  f"{difference.sum():12.1e}")
+
+
+def bench_personalized(args):
+    """
+    Time top-k personalized PageRank by forward push against power
+    iteration over the whole graph, comparing the top pages each finds.
+    Both run on the same prebuilt `LinkGraph`.
+    """
+    corpus = synthetic_corpus(args.pages, args.links)
+    graph = LinkGraph.from_corpus(corpus)
+    index = graph.page_index()
+    rng = random.Random(0)
+    print(f"random {args.pages}: {args.pages} pages, top {args.top}, "
+          f"tolerance {args.tolerance:g}")
+    for query in range(args.queries):
+        sources = rng.sample(graph.pages, args.sources)
+
+        start = time.perf_counter()
+        top = pagerank.personalized_pagerank(
+            graph, sources, pagerank.DAMPING, k=args.top,
+            tolerance=args.tolerance
+        )
+        push_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        personalization = np.zeros(len(graph))
+        personalization[[index[page] for page in sources]] = 1 / len(sources)
+        exact, _ = graph.pagerank(pagerank.DAMPING,
+                                  personalization=personalization)
+        power_time = time.perf_counter() - start
+
+        expected = {graph.pages[i] for i in np.argsort(-exact)[:args.top]}
+        found = {page for page, _ in top}
+        error = max(exact[index[page]] - rank for page, rank in top)
+        print(f"  push {push_time:.4f}s, power iteration {power_time:.4f}s, "
+              f"top {args.top} overlap {len(found & expected)}, "
+              f"max error {error:.1e}")
+
+
+def bench_sparse(args):
+    """Time building and iterating the sparse engine on a large graph."""
+    sources, targets = synthetic_edges(args.pages, args.links, args.dangling)
+    pages = [f"{i}.html" for i in range(args.pages)]
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    graph = LinkGraph.from_edges(pages, sources, targets)
+    build_time = time.perf_counter() - start
+    start = time.perf_counter()
+    ranks, iterations = graph.pagerank(pagerank.DAMPING, args.tolerance)
+    rank_time = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    print(f"{args.pages} pages, {len(graph.indices)} links, "
+          f"{len(graph.dangling)} without links")
+    print(f"  build    {build_time:.3f}s")
+    print(f"  iterate  {rank_time:.3f}s ({iterations} iterations, "
+          f"{rank_time / iterations * 1000:.1f} ms each)")
+    print(f"  peak memory {peak / 2 ** 20:.0f} MiB, ranks sum to "
+          f"{ranks.sum():.12f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PageRank.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    corpora = commands.add_parser(
+        "corpora", help="compare with iterate_pagerank on small corpora"
+    )
+    corpora.add_argument("--directories", nargs="+",
+                         default=["corpus0", "corpus1", "corpus2"])
+    corpora.add_argument("--pages", type=int, default=200)
+    corpora.add_argument("--links", type=int, default=5)
+    corpora.set_defaults(run=bench_corpora)
+
+    sampling = commands.add_parser(
+        "sampling", help="sample_pagerank against batched sampling"
+    )
+    sampling.add_argument("--directories", nargs="+",
+                          default=["corpus0", "corpus1", "corpus2"])
+    sampling.add_argument("--pages", type=int, default=500)
+    sampling.add_argument("--links", type=int, default=10)
+    sampling.add_argument("--samples", type=int, nargs="+",
+                          default=[10_000, 100_000, 10_000_000])
+    sampling.add_argument("--max-legacy-samples", type=int, default=100_000)
+    sampling.add_argument("--walkers", type=int, default=100_000)
+    sampling.set_defaults(run=bench_sampling)
+
+    crawl = commands.add_parser(
+        "crawl", help="pagerank.crawl against the parallel crawler"
+    )
+    crawl.add_argument("--pages", type=int, default=20_000)
+    crawl.add_argument("--links", type=int, default=10)
+    crawl.add_argument("--workers", type=int, nargs="+",
+                       default=sorted({1, 2, 4, os.cpu_count()}))
+    crawl.set_defaults(run=bench_crawl)
+
+    update = commands.add_parser(
+        "update", help="warm-started and pushed updates against recomputing"
+    )
+    update.add_argument("--pages", type=int, default=100_000)
+    update.add_argument("--links", type=int, default=10)
+    update.add_argument("--changes", type=int, nargs="+",
+                        default=[1, 10, 100, 1_000, 10_000])
+    update.add_argument("--push-tolerance", type=float, default=1e-12,
+                        help="residual PageRank per link left unpushed")
+    update.set_defaults(run=bench_update)
+
+    personalized = commands.add_parser(
+        "personalized", help="forward push against power iteration"
+    )
+    personalized.add_argument("--pages", type=int, default=200_000)
+    personalized.add_argument("--links", type=int, default=10)
+    personalized.add_argument("--sources", type=int, default=1)
+    personalized.add_argument("--queries", type=int, default=5)
+    personalized.add_argument("--top", type=int, default=10)
+    personalized.add_argument("--tolerance", type=float,
+                              default=pagerank.PUSH_TOLERANCE)
+    personalized.set_defaults(run=bench_personalized)
+
+    sparse = commands.add_parser("sparse", help="sparse engine at scale")
+    sparse.add_argument("--pages", type=int, default=1_000_000)
+    sparse.add_argument("--links", type=int, default=10)
+    sparse.add_argument("--dangling", type=float, default=0.1)
+    sparse.add_argument("--tolerance", type=float,
+                        default=pagerank.TOLERANCE)
+    sparse.set_defaults(run=bench_sparse)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
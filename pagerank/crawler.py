@@ -0,0 +1,128 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# The link pattern of `pagerank.crawl`, compiled once
+LINK = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# Characters read from a page at a time
+CHUNK_SIZE = 1 << 16
+
+# Set in each worker by `init_worker`: the corpus directory and the
+# integer ID of every page in it
+directory = None
+index = None
+
+
+def list_pages(corpus):
+    """Return the sorted names of the HTML pages in directory `corpus`."""
+    return sorted(filename for filename in os.listdir(corpus)
+                  if filename.endswith(".html"))
+
+
+def page_links(path):
+    """
+    Return the set of every link in the HTML file at `path`, reading it a
+    chunk at a time. A link split between two chunks is found once the
+    rest of it has been read.
+    """
+    links = set()
+    carry = ""
+    with open(path) as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            text = carry + chunk
+            if len(chunk) < CHUNK_SIZE:
+                links.update(LINK.findall(text))
+                return links
+            end = 0
+            for match in LINK.finditer(text):
+                links.add(match.group(1))
+                end = match.end()
+            carry = text[unfinished(text, end):]
+
+
+def unfinished(text, start):
+    """
+    Return the position in `text`, at or after `start`, of the first tag
+    that might still become a link once more text is read, or the end
+    of `text` if there is none.
+    """
+    position = text.find("<a", start)
+    while position != -1:
+        rest = text[position + 2:]
+        if not rest.strip():
+            return position
+        if rest[0].isspace():
+            close = rest.find(">")
+            if close == -1 or rest.find('href="', 0, close) != -1:
+                return position
+        position = text.find("<a", position + 1)
+    return len(text) - 1 if text.endswith("<") else len(text)
+
+
+def init_worker(corpus, pages):
+    """Share the corpus directory and page IDs with a worker process."""
+    global directory, index
+    directory = corpus
+    index = {page: i for i, page in enumerate(pages)}
+
+
+def page_targets(pages):
+    """
+    Return arrays (counts, targets) for list `pages`: how many other pages
+    in the corpus each links to, and their integer IDs, sorted per page.
+    """
+    counts, targets = [], []
+    for page in pages:
+        links = page_links(os.path.join(directory, page))
+        linked = {index[link] for link in links if link in index}
+        linked.discard(index[page])
+        counts.append(len(linked))
+        targets.extend(sorted(linked))
+    return (np.array(counts, dtype=np.int64),
+            np.array(targets, dtype=np.int32))
+
+
+def crawl_edges(corpus, workers=None):
+    """
+    Parse directory `corpus` of HTML pages on a pool of `workers`
+    processes (or in this one, if `workers` is 1).
+
+    Return (pages, sources, targets): the sorted list of page names and
+    integer arrays with an entry per link from page sources[i] to page
+    targets[i], as `graph.LinkGraph.from_edges` takes.
+    """
+    pages = list_pages(corpus)
+    workers = workers or os.cpu_count()
+    if workers == 1:
+        init_worker(corpus, pages)
+        results = [page_targets(pages)]
+    else:
+        size = max(1, -(-len(pages) // (4 * workers)))
+        batches = [pages[i:i + size] for i in range(0, len(pages), size)]
+        with ProcessPoolExecutor(workers, initializer=init_worker,
+                                 initargs=(corpus, pages)) as pool:
+            results = list(pool.map(page_targets, batches))
+
+    counts = np.concatenate([counts for counts, _ in results]
+                            + [np.zeros(0, dtype=np.int64)])
+    targets = np.concatenate([targets for _, targets in results]
+                             + [np.zeros(0, dtype=np.int32)])
+    sources = np.repeat(np.arange(len(pages), dtype=np.int32), counts)
+    return pages, sources, targets
+
+
+def crawl(corpus, workers=None):
+    """
+    Parse directory `corpus` like `pagerank.crawl`, with `crawl_edges`.
+    Return a dictionary where each key is a page, and values are
+    a set of all other pages in the corpus that are linked to by the page.
+    """
+    pages, sources, targets = crawl_edges(corpus, workers)
+    result = {page: set() for page in pages}
+    for source, target in zip(sources.tolist(), targets.tolist()):
+        result[pages[source]].add(pages[target])
+    return result
@@ -0,0 +1,422 @@
+import numpy as np
+
+
+class LinkGraph():
+    """
+    Compact form of a corpus of linked pages.
+
+    Pages are interned to dense integers (their position in `pages`), and
+    links are stored as a compressed-sparse-row adjacency over incoming
+    links: row i of (indptr, indices) lists every page linking to page i.
+    Multiplying by the transition matrix is then a gather and a sum per
+    row, instead of a Python loop over every pair of pages.
+    """
+
+    def __init__(self, pages, indptr, indices, out_degree):
+        self.pages = pages
+        self.indptr = indptr
+        self.indices = indices
+        self.out_degree = out_degree
+
+        # Page each entry of `indices` links to, and pages with no links
+        self.rows = np.repeat(np.arange(len(pages), dtype=np.int32),
+                              np.diff(indptr))
+        self.dangling = np.flatnonzero(out_degree == 0)
+
+        # Outgoing links, built on first use by `sample` or `push` (or
+        # patched by `update`), and the integer ID of each page name,
+        # built on first use by `page_index`
+        self.out_indptr = None
+        self.out_links = None
+        self.index = None
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Build the graph of a corpus as returned by `pagerank.crawl`: a
+        dictionary of page to the set of pages it links to.
+        """
+        pages = sorted(corpus)
+        index = {page: i for i, page in enumerate(pages)}
+        sources, targets = [], []
+        for page, links in corpus.items():
+            for link in links:
+                sources.append(index[page])
+                targets.append(index[link])
+        return cls.from_edges(pages, sources, targets)
+
+    @classmethod
+    def from_edges(cls, pages, sources, targets):
+        """
+        Build the graph of list `pages` from parallel sequences of integer
+        link `sources` and `targets`. Duplicate links are kept once and
+        links from a page to itself are dropped, as `crawl` does.
+        """
+        n = len(pages)
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        keep = sources != targets
+        links = np.sort(targets[keep] * max(n, 1) + sources[keep])
+        links = links[np.diff(links, prepend=-1) != 0]
+        targets, sources = np.divmod(links, max(n, 1))
+
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(targets, minlength=n), out=indptr[1:])
+        out_degree = np.bincount(sources, minlength=n)
+        return cls(pages, indptr, sources.astype(np.int32), out_degree)
+
+    def __len__(self):
+        return len(self.pages)
+
+    def step(self, ranks, damping_factor, personalization=None):
+        """
+        Return the ranks after one step of the random surfer from `ranks`.
+        A page with no links is treated as linking to every page, as in
+        `pagerank.transition_model`, or if `personalization` (an array of
+        probabilities summing to 1) is given, the surfer jumps to pages
+        according to it instead of uniformly.
+        """
+        n = len(self.pages)
+        share = ranks / np.maximum(self.out_degree, 1)
+        following = np.bincount(self.rows, weights=share[self.indices],
+                                minlength=n)
+        jump = 1 - damping_factor + damping_factor * ranks[self.dangling].sum()
+        if personalization is None:
+            return damping_factor * following + jump / n
+        return damping_factor * following + jump * personalization
+
+    def pagerank(self, damping_factor, tolerance=1e-10, max_iterations=1000,
+                 ranks=None, personalization=None):
+        """
+        Power iteration from `ranks` (uniform if not given) until the L1
+        distance between successive rank vectors is at most `tolerance`.
+        `personalization` is passed to `step`.
+
+        Return (ranks, iterations): an array of PageRank indexed like
+        `pages`, summing to 1, and the number of steps taken.
+        """
+        n = len(self.pages)
+        if ranks is None:
+            ranks = np.full(n, 1 / n)
+        else:
+            ranks = np.asarray(ranks, dtype=np.float64) / np.sum(ranks)
+
+        for iteration in range(1, max_iterations + 1):
+            new_ranks = self.step(ranks, damping_factor, personalization)
+            delta = np.abs(new_ranks - ranks).sum()
+            ranks = new_ranks
+            if delta <= tolerance:
+                break
+        return ranks, iteration
+
+    def scores(self, ranks, damping_factor):
+        """
+        Return (scores, residual) for `ranks`, an estimate of PageRank, as
+        `push` takes them.
+
+        PageRank is proportional to the scores z that solve
+        z = 1 + `damping_factor` * (links followed from z), where a page
+        with no links passes nothing on; scaling the scores to sum to 1
+        accounts for those pages. The residual is the right side minus z,
+        so it is zero for exact ranks, and stays zero after a change to
+        the graph except near the pages whose links changed.
+        """
+        n = len(self.pages)
+        ranks = np.asarray(ranks, dtype=np.float64)
+        ranks = ranks / ranks.sum()
+        scale = (1 - damping_factor
+                 + damping_factor * ranks[self.dangling].sum()) / n
+        scores = ranks / scale
+        share = scores / np.maximum(self.out_degree, 1)
+        residual = 1 - scores + damping_factor * np.bincount(
+            self.rows, weights=share[self.indices], minlength=n
+        )
+        return scores, residual
+
+    def push(self, scores, residual, active, damping_factor, tolerance,
+             restart=None):
+        """
+        Forward push, in place, from pages `active` until no page's
+        residual is more than `tolerance` times its number of links.
+
+        Each round, every page over that adds its residual to its score
+        and passes `damping_factor` of it along its links, or if it has
+        none, evenly to the pages of `restart` (or nowhere, if None). Only
+        the pages it reaches are checked for the next round, so the work
+        is proportional to the links near pages with large residuals
+        rather than to the size of the graph. Once a round would follow
+        a quarter of the links, every residual is pushed at once instead.
+
+        Return the number of links and pages pushed from, as a multiple
+        of the number of links, which is about what each step of
+        `pagerank` costs.
+        """
+        links = max(len(self.indices), 1)
+        active = np.asarray(active, dtype=np.int64)
+        active = active[np.abs(residual[active]) > tolerance * np.maximum(
+            self.out_degree[active], 1
+        )]
+        n = len(self.pages)
+        work = 0
+        while active.size:
+            degree = self.out_degree[active]
+            total = int(degree.sum())
+            if total * 4 >= links:
+                # Every link is followed anyway, so push every residual, on
+                # the whole arrays as `step` does
+                active = slice(None)
+                degree = self.out_degree
+                total = len(self.indices)
+                mass = residual.copy()
+            else:
+                mass = residual[active]
+            work += total + len(mass)
+            residual[active] = 0
+            scores[active] += mass
+            stuck = 0
+            if restart is not None:
+                stuck = damping_factor * mass[degree == 0].sum()
+
+            # Add up what each page reached is passed: by sorting the links
+            # pushed along if there are few, by counting them into every
+            # page if there are more, or by following every link, as
+            # `step` does, if they are most of them
+            if not total and not stuck:
+                targets = np.zeros(0, dtype=np.int64)
+            elif total * 16 < n:
+                targets, pushed = self.spread(active, damping_factor * mass)
+                if stuck:
+                    targets = np.concatenate([targets, restart])
+                    pushed = np.concatenate([
+                        pushed, np.full(len(restart), stuck / len(restart))
+                    ])
+                order = np.argsort(targets)
+                targets, pushed = targets[order], pushed[order]
+                starts = np.flatnonzero(np.diff(targets, prepend=-1) != 0)
+                targets = targets[starts]
+                residual[targets] += np.add.reduceat(pushed, starts)
+            else:
+                if total * 4 < links:
+                    targets, pushed = self.spread(active,
+                                                  damping_factor * mass)
+                    passed = np.bincount(targets, weights=pushed,
+                                         minlength=n)
+                else:
+                    share = damping_factor * mass / np.maximum(degree, 1)
+                    passed = np.bincount(self.rows,
+                                         weights=share[self.indices],
+                                         minlength=n)
+                if stuck:
+                    passed[restart] += stuck / len(restart)
+                residual += passed
+                targets = np.flatnonzero(passed)
+            active = targets[np.abs(residual[targets]) > tolerance
+                             * np.maximum(self.out_degree[targets], 1)]
+        return work / links
+
+    def spread(self, pages, amounts):
+        """
+        Return (targets, shares): every link from `pages`, as the page it
+        links to, and the even share of the page's entry of `amounts`
+        passed along it.
+        """
+        indptr, links = self.outgoing()
+        degree = self.out_degree[pages]
+        total = int(degree.sum())
+        first = np.cumsum(degree) - degree
+        targets = links[np.repeat(indptr[pages] - first, degree)
+                        + np.arange(total)]
+        shares = np.repeat(amounts / np.maximum(degree, 1), degree)
+        return targets, shares
+
+    def update(self, added_pages=(), removed_pages=(), added_links=(),
+               removed_links=()):
+        """
+        Return (graph, previous): a new graph with pages and links (pairs
+        of page names) added and removed, and for each of its pages the
+        integer ID the page had in this graph, or -1 for a new page.
+
+        Links are removed before links are added. Removing a page also
+        removes every link to and from it, and links naming pages that
+        are not in the new graph are ignored.
+
+        The link arrays are patched rather than rebuilt: kept pages keep
+        their order and new pages come last, so the links stay sorted
+        and only the changed links are sorted and merged in. The
+        outgoing links are patched too, if `outgoing` has built them.
+        """
+        index = self.page_index()
+        pages = list(self.pages)
+        new = {}
+        for page in added_pages:
+            if page not in index and page not in new:
+                new[page] = len(pages)
+                pages.append(page)
+
+        kept = np.ones(len(pages), dtype=bool)
+        for page in removed_pages:
+            i = index.get(page, new.get(page))
+            if i is not None:
+                kept[i] = False
+        renumber = (np.cumsum(kept) - 1).astype(np.int32)
+        n = max(int(kept.sum()), 1)
+
+        def ids(links):
+            pairs = [(index.get(page, new.get(page)),
+                      index.get(link, new.get(link)))
+                     for page, link in links]
+            pairs = [pair for pair in pairs if None not in pair]
+            sources, targets = np.array(pairs, dtype=np.int64).reshape(-1, 2).T
+            keep = kept[sources] & kept[targets] & (sources != targets)
+            return (renumber[sources[keep]].astype(np.int64),
+                    renumber[targets[keep]].astype(np.int64))
+
+        removed_sources, removed_targets = ids(removed_links)
+        added_sources, added_targets = ids(added_links)
+
+        # Incoming links as (target, source) pairs sorted by target and
+        # then source. Renumbering keeps them sorted, and is skipped when
+        # no page is removed, since new pages are numbered after the rest.
+        targets, sources = self.rows, self.indices
+        if not kept.all():
+            keep = kept[targets] & kept[sources]
+            targets = renumber[targets[keep]]
+            sources = renumber[sources[keep]]
+        targets, sources = patch(
+            targets, sources, n, (removed_targets, removed_sources),
+            (added_targets, added_sources)
+        )
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(targets, minlength=n), out=indptr[1:])
+        out_degree = np.bincount(sources, minlength=n)
+        if not kept.all():
+            pages = [page for page, k in zip(pages, kept.tolist()) if k]
+        graph = LinkGraph(pages, indptr, sources, out_degree)
+
+        # Outgoing links as (source, target) pairs, likewise
+        if self.out_links is not None:
+            sources = np.repeat(np.arange(len(self.pages), dtype=np.int32),
+                                self.out_degree)
+            targets = self.out_links
+            if not kept.all():
+                keep = kept[sources] & kept[targets]
+                sources = renumber[sources[keep]]
+                targets = renumber[targets[keep]]
+            _, graph.out_links = patch(
+                sources, targets, n, (removed_sources, removed_targets),
+                (added_sources, added_targets)
+            )
+            graph.out_indptr = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(out_degree, out=graph.out_indptr[1:])
+
+        previous = np.flatnonzero(kept)
+        previous[previous >= len(self.pages)] = -1
+        return graph, previous
+
+    def page_index(self):
+        """
+        Return the dictionary of page name to integer ID, built on first
+        use.
+        """
+        if self.index is None:
+            self.index = {page: i for i, page in enumerate(self.pages)}
+        return self.index
+
+    def outgoing(self):
+        """
+        Return (indptr, links): the CSR adjacency of outgoing links, where
+        row i lists every page that page i links to.
+        """
+        if self.out_indptr is None:
+            order = np.argsort(self.indices, kind="stable")
+            self.out_indptr = np.zeros(len(self.pages) + 1, dtype=np.int64)
+            np.cumsum(self.out_degree, out=self.out_indptr[1:])
+            self.out_links = self.rows[order]
+        return self.out_indptr, self.out_links
+
+    def sample(self, damping_factor, n, walkers=100_000, seed=None):
+        """
+        Estimate PageRank from about `n` pages visited by random surfers,
+        simulating up to `walkers` surfers at once.
+
+        Each surfer starts on a page chosen at random and, with
+        probability `damping_factor`, follows a random link (or goes to
+        any page, if there are none), otherwise stops. Every page visited
+        counts, and the visit counts of complete walks are an unbiased
+        estimate of PageRank. A surfer visits 1 / (1 - `damping_factor`)
+        pages on average, so about n * (1 - `damping_factor`) surfers
+        are simulated. `seed` makes the result reproducible.
+
+        Return an array of estimated PageRank indexed like `pages`.
+        """
+        if not 0 <= damping_factor < 1:
+            raise ValueError("damping factor must be at least 0 and below 1")
+        indptr, links = self.outgoing()
+        rng = np.random.default_rng(seed)
+        pages = len(self.pages)
+        visits = np.zeros(pages, dtype=np.int64)
+
+        remaining = max(1, round(n * (1 - damping_factor)))
+        while remaining:
+            batch = min(walkers, remaining)
+            remaining -= batch
+            current = rng.integers(0, pages, batch)
+            while current.size:
+                visits += np.bincount(current, minlength=pages)
+                current = current[rng.random(current.size) < damping_factor]
+                degree = self.out_degree[current]
+                follow = degree > 0
+                offset = (rng.random(current.size) * degree).astype(np.int64)
+                stuck = ~follow
+                current[follow] = links[indptr[current[follow]]
+                                        + offset[follow]]
+                current[stuck] = rng.integers(0, pages, stuck.sum())
+        return visits / visits.sum()
+
+
+def patch(first, second, n, removed, added):
+    """
+    Return (first, second): parallel arrays of distinct pairs of pages
+    numbered below `n`, sorted by first and then second, with the pairs
+    of `removed` taken out and those of `added` put in. Each of those is
+    a pair of arrays like (first, second). Only `added` is sorted; it is
+    merged into the others by binary search.
+    """
+    keys = first.astype(np.int64) * n + second
+    keep = np.ones(len(keys), dtype=bool)
+    removed = removed[0] * n + removed[1]
+    position = np.searchsorted(keys, removed)
+    found = position < len(keys)
+    found[found] = keys[position[found]] == removed[found]
+    keep[position[found]] = False
+
+    added_first, added_second = added
+    added = added_first * n + added_second
+    order = np.argsort(added)
+    added, added_first, added_second = (
+        added[order], added_first[order], added_second[order]
+    )
+    position = np.searchsorted(keys, added)
+    present = position < len(keys)
+    present[present] = keep[position[present]] & (
+        keys[position[present]] == added[present]
+    )
+    new = ~present & (np.diff(added, prepend=-1) != 0)
+    if keep.all() and not new.any():
+        return first, second
+
+    # Where each new pair goes once the removed pairs are gone
+    deleted = np.flatnonzero(~keep)
+    position = position[new]
+    position = (position - np.searchsorted(deleted, position)
+                + np.arange(len(position)))
+    slots = np.ones(keep.sum() + len(position), dtype=bool)
+    slots[position] = False
+    result = []
+    for column, added_column in ((first, added_first[new]),
+                                 (second, added_second[new])):
+        merged = np.empty(len(slots), dtype=column.dtype)
+        merged[slots] = column[keep]
+        merged[position] = added_column
+        result.append(merged)
+    return tuple(result)
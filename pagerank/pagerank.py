@@ -1,18 +1,77 @@
+import argparse
 import os
 import random
 import re
 import sys
 
+import numpy as np
+
+from graph import LinkGraph
+
 DAMPING = 0.85
 SAMPLES = 10000
 
+# Largest L1 change between sparse iterations that counts as converged
+TOLERANCE = 1e-10
+
+# Residual per link below which personalized PageRank stops pushing; on
+# 200,000 pages this leaves under 1e-2 in all and finds the top 10 exactly
+PUSH_TOLERANCE = 1e-8
+
+# Largest share of all links that the pages next to a change may have
+# for an incremental update to push rather than run power iteration
+PUSH_FRONTIER = 1 / 128
+
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
-    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
-    print(f"PageRank Results from Sampling (n = {SAMPLES})")
+    parser = argparse.ArgumentParser(
+        usage="python pagerank.py corpus [--sparse | --walkers N] [--seed S] "
+              "[--processes P] [--personalize PAGE ... [--top K]]"
+    )
+    parser.add_argument("corpus")
+    parser.add_argument("--sparse", action="store_true",
+                        help="iterate on a sparse link matrix instead of "
+                             "sampling")
+    parser.add_argument("--walkers", type=int,
+                        help="sample with up to N random surfers at once")
+    parser.add_argument("--seed", type=int,
+                        help="seed for reproducible sampling")
+    parser.add_argument("--processes", type=int,
+                        help="crawl the corpus on P processes")
+    parser.add_argument("--personalize", nargs="+", metavar="PAGE",
+                        help="rank pages for a surfer who restarts from "
+                             "these pages")
+    parser.add_argument("--top", type=int, default=10,
+                        help="number of personalized results")
+    args = parser.parse_args()
+
+    if args.processes:
+        import crawler
+        corpus = crawler.crawl(args.corpus, args.processes)
+    else:
+        corpus = crawl(args.corpus)
+    if args.personalize:
+        try:
+            top = personalized_pagerank(corpus, args.personalize, DAMPING,
+                                        args.top)
+        except ValueError as e:
+            sys.exit(f"Cannot personalize PageRank: {e}")
+        print(f"Personalized PageRank for {', '.join(args.personalize)}")
+        for page, rank in top:
+            print(f"  {page}: {rank:.4f}")
+        return
+    if args.sparse:
+        ranks, iterations = sparse_pagerank(corpus, DAMPING)
+        print(f"PageRank Results from Sparse Iteration "
+              f"({iterations} iterations)")
+    elif args.walkers:
+        ranks = batch_sample_pagerank(corpus, DAMPING, SAMPLES, args.walkers,
+                                      args.seed)
+        print(f"PageRank Results from Batched Sampling (n = {SAMPLES})")
+    else:
+        random.seed(args.seed)
+        ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
+        print(f"PageRank Results from Sampling (n = {SAMPLES})")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
     # ranks = iterate_pagerank(corpus, DAMPING)
@@ -115,6 +174,22 @@ def sample_pagerank(corpus, damping_factor, n)->dict[str, float]:
     return visits
 
 
+def batch_sample_pagerank(corpus, damping_factor, n, walkers=100_000,
+                          seed=None):
+    """
+    Return PageRank values for each page from about `n` pages visited by
+    random surfers, simulating up to `walkers` of them at once with
+    precomputed link arrays (see `LinkGraph.sample`). `seed` makes the
+    result reproducible.
+
+    Return a dictionary where keys are page names, and values are
+    their estimated PageRank value. All PageRank values sum to 1.
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    ranks = graph.sample(damping_factor, n, walkers, seed)
+    return dict(zip(graph.pages, ranks.tolist()))
+
+
 
 def iterate_pagerank(corpus, damping_factor):
     """
@@ -127,10 +202,17 @@ def iterate_pagerank(corpus, damping_factor):
     """
 
     page_rank={page:1/len(corpus) for page in corpus}
+    # a page with no links is treated as linking to every page
+    dangling_pages = [page for page in corpus if not corpus[page]]
 
     for i in range(1000):
+        dangling = sum(damping_factor * page_rank[page] / len(corpus)
+                       for page in dangling_pages)
         for page in corpus:
-            page_rank[page] = (1-damping_factor)/len(corpus) + sum([damping_factor*(page_rank[i]/len(corpus[i])) for i in corpus if page in corpus[i]])
+            page_rank[page] = (1-damping_factor)/len(corpus) + dangling + sum(
+                [damping_factor*(page_rank[i]/len(corpus[i]))
+                 for i in corpus if page in corpus[i]]
+            )
 
     return page_rank
 
@@ -138,6 +220,226 @@ def iterate_pagerank(corpus, damping_factor):
     # raise NotImplementedError
 
 
+def sparse_pagerank(corpus, damping_factor, tolerance=TOLERANCE):
+    """
+    Return PageRank values for each page by power iteration on a sparse
+    transition matrix, until the ranks change by at most `tolerance` in
+    total. Pages without links are treated as linking to every page.
+
+    Return (ranks, iterations): a dictionary of page name to PageRank
+    value, summing to 1, and the number of iterations it took.
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    ranks, iterations = graph.pagerank(damping_factor, tolerance)
+    return dict(zip(graph.pages, ranks.tolist())), iterations
+
+
+def personalized_pagerank(corpus, sources, damping_factor, k=10,
+                          tolerance=PUSH_TOLERANCE):
+    """
+    Return the `k` pages with the highest PageRank personalized to the
+    pages in `sources`: the random surfer jumps back to one of `sources`
+    with probability 1 - `damping_factor`, or when on a page with no
+    links, instead of to any page. `corpus` is a corpus as returned by
+    `crawl`, or the `LinkGraph` of one, which saves building it again
+    for each query.
+
+    Uses forward push (Andersen, Chung and Lang) on the link arrays (see
+    `LinkGraph.push`): each source starts with an equal share of
+    residual probability, and a page whose residual is more than
+    `tolerance` times its number of links keeps 1 - `damping_factor` of
+    it and pushes the rest along its links. Only pages near the sources
+    are ever visited.
+
+    Estimates are never above their true values, and each falls short
+    by at most the residual R left over in total, which is at most
+    `tolerance` times the number of links and pages. So any page left
+    out has PageRank below the k-th estimate plus R, and the k returned
+    are the true top k except for pages whose PageRank is within R of
+    the (k + 1)-th highest. The further down the ranking k goes, the
+    closer together the PageRank values there, so the lower `tolerance`
+    must be for R to separate them.
+
+    Return a list of (page, estimated PageRank) pairs from highest to
+    lowest, of every page reached if `k` is None. Raise ValueError if
+    there are no sources or some are not pages of `corpus`.
+    """
+    if isinstance(corpus, LinkGraph):
+        graph = corpus
+    else:
+        graph = LinkGraph.from_corpus(corpus)
+    sources = list(dict.fromkeys(sources))
+    if not sources:
+        raise ValueError("no pages to personalize to")
+    index = graph.page_index()
+    unknown = [page for page in sources if page not in index]
+    if unknown:
+        raise ValueError(f"not in corpus: {', '.join(unknown)}")
+
+    restart = np.array(sorted(index[page] for page in sources))
+    scores = np.zeros(len(graph))
+    residual = np.zeros(len(graph))
+    residual[restart] = 1 / len(restart)
+    graph.push(scores, residual, restart, damping_factor, tolerance,
+               restart=restart)
+    reached = np.flatnonzero(scores)
+    estimates = (1 - damping_factor) * scores[reached]
+
+    order = np.argsort(-estimates, kind="stable")
+    if k is not None:
+        order = order[:k]
+    return [(graph.pages[i], rank) for i, rank
+            in zip(reached[order].tolist(), estimates[order].tolist())]
+
+
+class IncrementalPageRank():
+    """
+    PageRank of a corpus that changes over time.
+
+    Ranks are found once by sparse power iteration. After each change to
+    the corpus the link arrays are patched rather than rebuilt from the
+    corpus dictionary, and the ranks are found again from the ranks
+    before the change: by power iteration starting from them, or, if
+    `push_tolerance` is given, by `LinkGraph.push`. Pushing keeps the
+    scores and residuals it works on between changes, so a change only
+    touches the residuals of pages next to the links that changed, and
+    only pages where the ranks are off by more than `push_tolerance` per
+    link are visited. Pushing spreads across the graph as it goes, so
+    after a change touching more than `PUSH_FRONTIER` of the links, power
+    iteration from the carried-over ranks is run instead.
+    """
+
+    def __init__(self, corpus, damping_factor, tolerance=TOLERANCE,
+                 ranks=None, push_tolerance=None):
+        """
+        Find the PageRank of `corpus`, as returned by `crawl`, starting
+        from dictionary `ranks` of earlier PageRank values if given.
+        """
+        self.damping_factor = damping_factor
+        self.tolerance = tolerance
+        self.push_tolerance = push_tolerance
+        self.graph = LinkGraph.from_corpus(corpus)
+        start = None
+        if ranks is not None:
+            start = [ranks.get(page, self.least())
+                     for page in self.graph.pages]
+        self.values, self.iterations = self.graph.pagerank(
+            damping_factor, tolerance, ranks=start
+        )
+        if push_tolerance is not None:
+            self.graph.outgoing()
+            self.scores, self.residual = self.graph.scores(self.values,
+                                                           damping_factor)
+            self.active = np.zeros(0, dtype=np.int64)
+
+    def least(self):
+        """
+        Return the least PageRank any page can have, (1 - damping) / N,
+        which a page new to the corpus starts with.
+        """
+        return (1 - self.damping_factor) / len(self.graph)
+
+    def update(self, added_pages=(), removed_pages=(), added_links=(),
+               removed_links=()):
+        """
+        Add and remove pages and links, which are (page, linked page)
+        pairs, as `LinkGraph.update` does, and update the ranks.
+
+        Return the number of power iterations the update took, or when
+        pushing, the work it took as a number of iterations' worth.
+        """
+        self.patch(added_pages, removed_pages, added_links, removed_links)
+        return self.rerank()
+
+    def patch(self, added_pages=(), removed_pages=(), added_links=(),
+              removed_links=()):
+        """
+        The first half of `update`: change the graph, and carry the ranks,
+        or the scores and residuals pushed from, over to it.
+        """
+        old = self.graph
+        self.graph, previous = old.update(added_pages, removed_pages,
+                                          added_links, removed_links)
+        kept = previous >= 0
+        if self.push_tolerance is None:
+            self.values = np.where(kept, self.values[previous], self.least())
+            return
+
+        # A new page has no score yet, so all of its residual of 1 is left
+        scores = np.zeros(len(self.graph))
+        scores[kept] = self.scores[previous[kept]]
+        residual = np.ones(len(self.graph))
+        residual[kept] = self.residual[previous[kept]]
+        renumber = np.full(len(old), -1, dtype=np.int64)
+        renumber[previous[kept]] = np.flatnonzero(kept)
+
+        # Pages whose links changed, including those linking to a removed
+        # page, take back what they passed along their old links and pass
+        # it along their new ones
+        index = old.page_index()
+        removed = [index[page] for page in removed_pages if page in index]
+        changed = [index.get(page) for page, _ in added_links]
+        changed += [index.get(page) for page, _ in removed_links]
+        changed = np.unique(np.array(
+            [i for i in changed if i is not None] + removed
+            + [j for i in removed
+               for j in old.indices[old.indptr[i]:old.indptr[i + 1]].tolist()],
+            dtype=np.int64
+        ))
+        targets, shares = old.spread(
+            changed, -self.damping_factor * self.scores[changed]
+        )
+        targets = renumber[targets]
+        taken, shares = targets[targets >= 0], shares[targets >= 0]
+        np.add.at(residual, taken, shares)
+        changed = renumber[changed]
+        changed = changed[changed >= 0]
+        given, shares = self.graph.spread(
+            changed, self.damping_factor * scores[changed]
+        )
+        np.add.at(residual, given, shares)
+
+        self.scores, self.residual = scores, residual
+        self.active = np.unique(np.concatenate(
+            [taken, given, np.flatnonzero(~kept)]
+        ))
+
+    def rerank(self):
+        """
+        The second half of `update`: find the ranks of the changed graph
+        from those carried over by `patch`, and return the work it took.
+        """
+        if self.push_tolerance is None:
+            self.values, self.iterations = self.graph.pagerank(
+                self.damping_factor, self.tolerance, ranks=self.values
+            )
+            return self.iterations
+
+        frontier = self.graph.out_degree[self.active].sum()
+        if frontier <= PUSH_FRONTIER * len(self.graph.indices):
+            # The tolerance is in PageRank, the scores over their sum
+            self.iterations = self.graph.push(
+                self.scores, self.residual, self.active, self.damping_factor,
+                self.push_tolerance * self.scores.sum()
+            )
+            self.values = self.scores / self.scores.sum()
+            return self.iterations
+
+        # Finding the scores and residuals to push from next time costs
+        # one more iteration
+        self.values, iterations = self.graph.pagerank(
+            self.damping_factor, self.tolerance, ranks=self.scores
+        )
+        self.scores, self.residual = self.graph.scores(self.values,
+                                                       self.damping_factor)
+        self.iterations = iterations + 1
+        return self.iterations
+
+    def ranks(self):
+        """Return a dictionary of page name to PageRank value."""
+        return dict(zip(self.graph.pages, self.values.tolist()))
+
+
 if __name__ == "__main__":
     main()
     # expected pagerank 1 to be in range [0.16991, 0.26991], got 0.4625 instead